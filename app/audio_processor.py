@@ -1,149 +1,367 @@
+import asyncio
+import logging
 import os
-from typing import Optional, Dict
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Dict
+import numpy as np
 from app.transcriber import Transcriber
 from app.llm_processor import LLMProcessor
 from app.polly_synthesizer import PollySynthesizer
 
-# Global instances - initialized once
-_transcriber: Optional[Transcriber] = None
+logger = logging.getLogger(__name__)
+
+# Shared stateless services - initialized once at startup. Transcriber state
+# is per-connection (see Session) so concurrent websockets don't fight over
+# one Transcribe stream.
 _llm_processor: Optional[LLMProcessor] = None
 _polly_synthesizer: Optional[PollySynthesizer] = None
-_transcription_session: Optional[Dict] = None
+
+KEEPALIVE_INTERVAL_S = 10
+KEEPALIVE_SILENCE = b'\x00' * 3200  # 100ms of 16kHz PCM16 silence
+
+# Early-reject gate: buffers shorter or quieter than this never reach
+# Transcribe/LLM/Polly - no point spending API calls on ambient noise
+MIN_BUFFER_BYTES = int(0.25 * 16000 * 2)  # 250ms of 16kHz PCM16
+MIN_BUFFER_RMS = float(os.getenv("MIN_BUFFER_RMS", "300"))
+
+@dataclass
+class Session:
+    """Per-connection pipeline state
+
+    The transcriber and its stream belong to one websocket connection;
+    the LLM and Polly services are stateless and shared across sessions.
+    """
+    transcriber: Transcriber
+    llm: LLMProcessor
+    polly: PollySynthesizer
+    transcription_session: Optional[Dict] = None
+    last_audio_ts: float = 0.0
+    keepalive_task: Optional[asyncio.Task] = None
 
 def _initialize_services():
-    """Initialize all services once"""
-    global _transcriber, _llm_processor, _polly_synthesizer
-    
-    if _transcriber is None:
-        _transcriber = Transcriber()
-        print(f"Transcriber initialized: {_transcriber is not None}")
-    
+    """Initialize the shared (stateless) services once"""
+    global _llm_processor, _polly_synthesizer
+
     if _llm_processor is None:
-        print("About to create LLMProcessor instance...")
+        logger.info("About to create LLMProcessor instance...")
         _llm_processor = LLMProcessor()
-        print(f"LLM Processor initialized: {_llm_processor is not None}, client: {_llm_processor.client is not None if _llm_processor else 'N/A'}")
-    
+        logger.info(f"LLM Processor initialized: {_llm_processor is not None}, client: {_llm_processor.client is not None if _llm_processor else 'N/A'}")
+
     # If LLMProcessor exists but client is None, try to reinitialize (in case env vars weren't loaded before)
     if _llm_processor and _llm_processor.client is None:
-        print("WARNING: LLMProcessor.client is None - trying to reinitialize with current environment...")
+        logger.info("WARNING: LLMProcessor.client is None - trying to reinitialize with current environment...")
         _llm_processor = LLMProcessor()  # Reinitialize - maybe env vars are available now
-        print(f"LLM Processor reinitialized: client={_llm_processor.client is not None if _llm_processor else 'N/A'}")
-    
+        logger.info(f"LLM Processor reinitialized: client={_llm_processor.client is not None if _llm_processor else 'N/A'}")
+
     if _polly_synthesizer is None:
         _polly_synthesizer = PollySynthesizer()
-        print(f"Polly Synthesizer initialized: {_polly_synthesizer is not None}")
+        logger.info(f"Polly Synthesizer initialized: {_polly_synthesizer is not None}")
 
-def _start_session_if_needed():
+def create_session() -> Session:
+    """Create per-connection pipeline state with a dedicated Transcriber"""
+    _initialize_services()
+    session = Session(
+        transcriber=Transcriber(),
+        llm=_llm_processor,
+        polly=_polly_synthesizer,
+    )
+    logger.info("Session created (dedicated Transcribe stream)")
+    return session
+
+async def close_session(session: Session):
+    """Tear down per-connection state when the websocket closes"""
+    if session.keepalive_task and not session.keepalive_task.done():
+        session.keepalive_task.cancel()
+        try:
+            await session.keepalive_task
+        except asyncio.CancelledError:
+            pass
+        session.keepalive_task = None
+
+    transcriber = session.transcriber
+    if transcriber:
+        logger.info("Closing transcription stream for this session...")
+        # aclose ends the AWS input stream explicitly so the service can
+        # release the session immediately instead of waiting for a timeout
+        await transcriber.aclose()
+
+async def _keepalive_loop(session: Session):
+    """Feed silent frames to Transcribe while idle so the stream stays open"""
+    while True:
+        await asyncio.sleep(KEEPALIVE_INTERVAL_S)
+        transcriber = session.transcriber
+        if not (transcriber and transcriber.is_streaming and transcriber.stream):
+            continue
+        if time.time() - session.last_audio_ts > KEEPALIVE_INTERVAL_S - 1:
+            try:
+                if transcriber.stream.input_stream:
+                    await transcriber.stream.input_stream.send_audio_event(
+                        audio_chunk=KEEPALIVE_SILENCE
+                    )
+            except Exception as e:
+                logger.info(f"Keep-alive frame failed (stream will restart on next audio): {e}")
+
+def _start_session_if_needed(session: Session):
     """Start transcription session if not already started"""
-    global _transcription_session, _transcriber
-    
-    if _transcription_session is None and _transcriber:
-        _transcription_session = _transcriber.start_transcription()
-        print("Transcription session started")
+    if session.transcription_session is None and session.transcriber:
+        session.transcription_session = session.transcriber.start_transcription()
+        logger.info("Transcription session started")
 
-async def process_audio_async(chunk: bytes) -> bytes:
+    if session.keepalive_task is None or session.keepalive_task.done():
+        session.keepalive_task = asyncio.create_task(_keepalive_loop(session))
+
+async def warmup():
     """
-    Complete audio processing pipeline (async version):
-    1. Transcribe audio to text (AWS Transcribe)
-    2. Process text with LLM
-    3. Convert LLM response to audio (Amazon Polly)
+    Pre-warm the shared services at server startup so the first user doesn't
+    pay for client construction and connection establishment
     """
-    import time
-    pipeline_start = time.time()
-    
-    # Initialize services
     _initialize_services()
-    _start_session_if_needed()
-    
+
+    # Force connection pools open with cheap dummy calls
+    if _polly_synthesizer:
+        try:
+            await _polly_synthesizer.synthesize_speech_async(" ")
+            logger.info("Warmup: Polly connection established")
+        except Exception as e:
+            logger.info(f"Warmup: Polly warmup failed (continuing): {e}")
+
+    if _llm_processor and _llm_processor.client:
+        try:
+            await _llm_processor.client.models.list()
+            logger.info("Warmup: OpenAI connection established")
+        except Exception as e:
+            logger.info(f"Warmup: OpenAI warmup failed (continuing): {e}")
+
+async def _transcribe_utterance(session: Session, chunk: bytes) -> Optional[str]:
+    """
+    Send one utterance to Transcribe and await its transcript
+
+    The pipeline only runs at a detected pause, so the chunk is already a
+    whole utterance; frame sizing on the wire is handled inside the
+    transcriber (20ms re-chunking and event coalescing).
+    Producer/consumer split: sending returns as soon as the frames are on
+    the wire; the transcript is then awaited from the persistent stream's
+    result queue
+    """
+    if not chunk:
+        return None
+    if not await session.transcriber.send_audio_chunk_async(chunk):
+        return None
+    return await session.transcriber.collect_transcript()
+
+async def _transcribe_stage(session: Session, chunk: bytes, transcript_q: asyncio.Queue):
+    """Stage 1: Transcribe audio to text (AWS Transcribe), feed transcripts downstream"""
     try:
-        # Step 1: Transcribe audio to text
-        if not _transcriber:
-            print("Error: Transcriber is None!")
-            return b''
-        
-        transcribe_start = time.time()
         try:
-            transcribed_text = await _transcriber.send_audio_chunk_async(chunk)
-            transcribe_time = time.time() - transcribe_start
+            transcribed_text = await _transcribe_utterance(session, chunk)
             # Only log transcription if it's meaningful
             if transcribed_text:
-                print(f"📝 Transcribed: {transcribed_text}")
+                logger.info(f"📝 Transcribed: {transcribed_text}")
         except Exception as e:
-            print(f"Error in transcription (continuing): {e}")
+            logger.info(f"Error in transcription (continuing): {e}")
             transcribed_text = None
-        
+
         # If no transcription yet, check if we should skip or use test mode
         if not transcribed_text:
             # Test mode: bypass transcription for testing LLM/Polly
             test_mode = os.getenv("TEST_MODE", "").lower() in ("true", "1", "yes")
             if test_mode:
-                print("TEST_MODE: Using placeholder text instead of transcription")
+                logger.info("TEST_MODE: Using placeholder text instead of transcription")
                 transcribed_text = "Hello, this is a test message."
             else:
-                print("No transcription available, skipping LLM and Polly steps")
-                return b''
-        
-        # Step 2: Process with LLM
-        if not _llm_processor:
-            print("Error: LLM Processor is None!")
-            return b''
-        
-        llm_start = time.time()
-        llm_response = _llm_processor.process_text(transcribed_text)
-        llm_time = time.time() - llm_start
-        
-        # Only log final LLM response
-        if llm_response:
-            print(f"🤖 LLM Response: {llm_response}")
-        
-        if not llm_response:
-            return b''
-        
-        # Step 3: Convert LLM response to audio
-        if not _polly_synthesizer:
-            return b''
-        
-        polly_start = time.time()
-        audio_output = _polly_synthesizer.synthesize_speech(llm_response)
-        polly_time = time.time() - polly_start
-        
+                logger.info("No transcription available, skipping LLM and Polly steps")
+
+        if transcribed_text:
+            await transcript_q.put(transcribed_text)
+    finally:
+        await transcript_q.put(None)  # Sentinel: no more transcripts
+
+# Sentence boundary for flushing streamed LLM text to Polly
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+async def _llm_stage(session: Session, transcript_q: asyncio.Queue, llm_q: asyncio.Queue):
+    """Stage 2: Stream transcripts through the LLM, flushing complete sentences to TTS"""
+    try:
+        while True:
+            transcribed_text = await transcript_q.get()
+            if transcribed_text is None:
+                break
+
+            # Stream token deltas and dispatch each complete sentence immediately
+            # so Polly can start on the first sentence of the reply
+            pending = ''
+            full_response = []
+            async for delta in session.llm.process_text_stream(transcribed_text):
+                pending += delta
+                parts = _SENTENCE_END.split(pending)
+                # Everything but the last part is a complete sentence
+                for sentence in parts[:-1]:
+                    if sentence.strip():
+                        full_response.append(sentence)
+                        await llm_q.put(sentence)
+                pending = parts[-1]
+
+            if pending.strip():
+                full_response.append(pending)
+                await llm_q.put(pending)
+
+            # Only log final LLM response
+            if full_response:
+                logger.info(f"🤖 LLM Response: {' '.join(full_response)}")
+    finally:
+        await llm_q.put(None)  # Sentinel: no more LLM responses
+
+# Bound concurrent Polly calls to stay under API TPS limits
+_polly_semaphore = asyncio.Semaphore(5)
+
+async def _synthesize_bounded(session: Session, text: str) -> Optional[bytes]:
+    """Synthesize one sentence, respecting the Polly concurrency cap"""
+    async with _polly_semaphore:
+        return await session.polly.synthesize_speech_async(text)
+
+async def _tts_stage(session: Session, llm_q: asyncio.Queue, audio_q: asyncio.Queue):
+    """
+    Stage 3: Convert LLM responses to audio (Amazon Polly)
+    Sentences are synthesized concurrently (fan-out) but emitted in order,
+    so TTS wall time approaches max(sentence) instead of sum(sentences)
+    """
+    tasks: list = []
+    next_to_emit = 0
+
+    async def _emit_ready():
+        """Forward completed synthesis results, preserving sentence order"""
+        nonlocal next_to_emit
+        while next_to_emit < len(tasks) and tasks[next_to_emit].done():
+            audio_output = tasks[next_to_emit].result()
+            next_to_emit += 1
+            if audio_output:
+                await audio_q.put(audio_output)
+            else:
+                logger.info("Failed to generate audio from LLM response")
+
+    while True:
+        llm_response = await llm_q.get()
+        if llm_response is None:
+            break
+        tasks.append(asyncio.create_task(_synthesize_bounded(session, llm_response)))
+        await _emit_ready()
+
+    # Drain the remaining tasks in order
+    for i in range(next_to_emit, len(tasks)):
+        audio_output = await tasks[i]
         if audio_output:
-            total_time = time.time() - pipeline_start
-            print(f"✅ Response ready ({len(audio_output)} bytes, {total_time:.1f}s)")
+            await audio_q.put(audio_output)
         else:
-            print("Failed to generate audio from LLM response")
-        
-        return audio_output if audio_output else b''
-    
+            logger.info("Failed to generate audio from LLM response")
+
+async def process_audio_async(session: Session, chunk: bytes) -> AsyncIterator[bytes]:
+    """
+    Complete audio processing pipeline (async generator):
+    1. Transcribe audio to text (AWS Transcribe)
+    2. Process text with LLM
+    3. Convert LLM response to audio (Amazon Polly)
+
+    The three stages run concurrently in a TaskGroup connected by queues,
+    so audio is yielded as soon as each stage has output instead of waiting
+    for the whole chain to finish.
+    """
+    pipeline_start = time.time()
+    session.last_audio_ts = pipeline_start
+
+    # Early-reject: drop too-short or too-quiet buffers before touching
+    # any downstream service
+    if len(chunk) < MIN_BUFFER_BYTES:
+        logger.info(f"Skipping buffer: too short ({len(chunk)} bytes < {MIN_BUFFER_BYTES})")
+        return
+    samples = np.frombuffer(chunk, dtype='<i2', count=len(chunk) // 2)
+    rms = float(np.sqrt(np.mean(samples.astype(np.int64) ** 2)))
+    if rms < MIN_BUFFER_RMS:
+        logger.info(f"Skipping buffer: below speech energy (RMS {rms:.0f} < {MIN_BUFFER_RMS:.0f})")
+        return
+
+    _start_session_if_needed(session)
+
+    if not session.transcriber:
+        logger.info("Error: Transcriber is None!")
+        return
+    if not session.llm:
+        logger.info("Error: LLM Processor is None!")
+        return
+    if not session.polly:
+        return
+
+    transcript_q: asyncio.Queue = asyncio.Queue()
+    llm_q: asyncio.Queue = asyncio.Queue()
+    audio_q: asyncio.Queue = asyncio.Queue()
+
+    async def _run_pipeline():
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(_transcribe_stage(session, chunk, transcript_q))
+                tg.create_task(_llm_stage(session, transcript_q, llm_q))
+                tg.create_task(_tts_stage(session, llm_q, audio_q))
+        finally:
+            await audio_q.put(None)  # Sentinel: pipeline finished
+
+    pipeline_task = asyncio.create_task(_run_pipeline())
+
+    total_bytes = 0
+    try:
+        while True:
+            audio_output = await audio_q.get()
+            if audio_output is None:
+                break
+            total_bytes += len(audio_output)
+            yield audio_output
+
+        await pipeline_task
+
+        if total_bytes:
+            total_time = time.time() - pipeline_start
+            logger.info(f"✅ Response ready ({total_bytes} bytes, {total_time:.1f}s)")
     except Exception as e:
         total_time = time.time() - pipeline_start
-        print(f"❌ Error in audio processing pipeline after {total_time:.2f}s: {e}")
-        import traceback
-        traceback.print_exc()
-        return b''
+        logger.exception(f"❌ Error in audio processing pipeline after {total_time:.2f}s: {e}")
+    finally:
+        # Cancel on every exit path: if the consumer abandons the generator
+        # (e.g. the websocket send fails mid-response), it is closed with
+        # GeneratorExit - a BaseException the except above never sees - and
+        # without this the TaskGroup would run the paid Transcribe/LLM/Polly
+        # stages to completion for a client that is already gone
+        if not pipeline_task.done():
+            pipeline_task.cancel()
+
+# Persistent background loop for sync callers: created once at import so
+# process_audio doesn't pay event-loop setup/teardown (and fresh client
+# construction) on every call, and can't collide with an already-running loop
+_bg_loop = asyncio.new_event_loop()
+threading.Thread(target=_bg_loop.run_forever, daemon=True).start()
 
 def process_audio(chunk: bytes) -> bytes:
     """
     Sync wrapper for process_audio_async
     This is kept for backward compatibility but should use async version
+    Runs the pipeline on a persistent background event loop, so clients and
+    sessions created there are reused across calls
     """
-    import asyncio
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If loop is running, we need to handle this differently
-            # For now, return empty - should use async version
-            print("Warning: process_audio called from async context. Use process_audio_async instead.")
-            return b''
-        else:
-            return loop.run_until_complete(process_audio_async(chunk))
-    except RuntimeError:
-        return asyncio.run(process_audio_async(chunk))
-
-def reset_session():
-    """Reset the transcription session for a new conversation"""
-    global _transcription_session
-    _transcription_session = None
-    if _transcriber:
-        _transcriber.transcription_buffer = []
-    print("Session reset")
+    async def _collect() -> bytes:
+        session = create_session()
+        try:
+            pieces = []
+            async for audio_output in process_audio_async(session, chunk):
+                pieces.append(audio_output)
+            return b''.join(pieces)
+        finally:
+            await close_session(session)
+
+    return asyncio.run_coroutine_threadsafe(_collect(), _bg_loop).result()
+
+def reset_session(session: Session):
+    """Reset the transcription session after a genuine session error"""
+    session.transcription_session = None
+    if session.transcriber:
+        session.transcriber.clear_transcription()
+    logger.info("Session reset")
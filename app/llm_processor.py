@@ -1,17 +1,59 @@
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Optional
-from openai import OpenAI
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Optional
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
-print("LLM: Module llm_processor.py imported")
+logger.info("LLM: Module llm_processor.py imported")
+
+# One shared HTTP client for all LLM calls: HTTP/2 multiplexes concurrent
+# requests over a single connection and keep-alive avoids paying a fresh
+# TCP+TLS handshake per call
+_http = httpx.AsyncClient(
+    http2=True,
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
+)
+
+async def close_llm_http_client():
+    """Shutdown hook: close the shared HTTP connection pool"""
+    await _http.aclose()
 
 class LLMProcessor:
     """Handles LLM text processing using OpenAI"""
     
+    # Cache sizing / similarity knobs
+    _EXACT_CACHE_CAP = 512
+    _SEMANTIC_CACHE_CAP = 256  # linear scan per lookup, so keep it modest
+    _SEMANTIC_THRESHOLD = 0.92
+
+    # Stable user id sent with completions so OpenAI routes repeated
+    # identical prompt prefixes to the same cache shard
+    _PROMPT_CACHE_USER = "audio-stream-websocket"
+
     def __init__(self):
-        print("LLM: Initializing LLMProcessor...")
+        logger.info("LLM: Initializing LLMProcessor...")
+        # Two-tier response cache: exact hash match + embedding near-match
+        # so repeated FAQ-style questions skip the OpenAI round-trip entirely
+        self._exact_cache: OrderedDict[str, str] = OrderedDict()
+        # Semantic tier: (embedding ndarray, cache key, answer) triples.
+        # Bounded deque so entries are evicted oldest-first alongside the
+        # exact LRU instead of accumulating for the process lifetime
+        self._embeds: deque = deque(maxlen=self._SEMANTIC_CACHE_CAP)
+
+        # Read resume.txt once and pre-assemble the default system prompt -
+        # both were previously rebuilt on every process_text call
+        self._resume = self._load_resume()
+        self._default_prompt = self._build_default_prompt()
         # Try to load .env file (for local development)
         # In Docker, env vars are already set via --env-file
         load_dotenv(override=False)
@@ -21,48 +63,45 @@ class LLMProcessor:
         for proxy_var in proxy_vars:
             if proxy_var in os.environ:
                 del os.environ[proxy_var]
-                print(f"LLM: Removed {proxy_var} from environment")
+                logger.info(f"LLM: Removed {proxy_var} from environment")
         
         # Get API key from environment (works in both local and Docker)
         api_key = os.environ.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
         
-        print(f"LLM: API key check - found: {bool(api_key)}, length: {len(api_key) if api_key else 0}")
+        logger.info(f"LLM: API key check - found: {bool(api_key)}, length: {len(api_key) if api_key else 0}")
         
         if not api_key:
-            print("Warning: OPENAI_API_KEY not found in environment")
-            print(f"Debug: Checking env vars...")
+            logger.info("Warning: OPENAI_API_KEY not found in environment")
+            logger.info(f"Debug: Checking env vars...")
             # Show all env vars (masked) for debugging
             env_keys = list(os.environ.keys())
             openai_keys = [k for k in env_keys if 'OPENAI' in k.upper() or 'OPEN' in k.upper()]
-            print(f"Debug: Total env vars: {len(env_keys)}")
+            logger.info(f"Debug: Total env vars: {len(env_keys)}")
             if openai_keys:
-                print(f"Debug: Found env vars containing 'OPEN': {openai_keys}")
+                logger.info(f"Debug: Found env vars containing 'OPEN': {openai_keys}")
                 for key in openai_keys:
                     val = os.environ.get(key, '')
-                    print(f"Debug: {key} = {'SET' if val else 'EMPTY'} (length: {len(val)})")
+                    logger.info(f"Debug: {key} = {'SET' if val else 'EMPTY'} (length: {len(val)})")
             else:
-                print("Debug: No environment variables found with 'OPEN' in name")
+                logger.info("Debug: No environment variables found with 'OPEN' in name")
                 # Show first 20 env var names for debugging
-                print(f"Debug: Sample env vars: {list(env_keys)[:20]}")
+                logger.info(f"Debug: Sample env vars: {list(env_keys)[:20]}")
             self.client = None
         else:
             try:
-                # Explicitly disable proxies by passing http_client without proxy config
-                import httpx
-                http_client = httpx.Client(timeout=60.0)
-                self.client = OpenAI(api_key=api_key, http_client=http_client)
-                print(f"LLM: OpenAI client initialized successfully (key: {api_key[:10]}...)")
+                # Share the module-level pooled HTTP client (also avoids any
+                # ambient proxy config being picked up)
+                self.client = AsyncOpenAI(api_key=api_key, http_client=_http)
+                logger.info(f"LLM: OpenAI client initialized successfully (key: {api_key[:10]}...)")
             except Exception as e:
-                print(f"LLM: Error initializing OpenAI client: {e}")
+                logger.info(f"LLM: Error initializing OpenAI client: {e}")
                 # Fallback: try without explicit http_client
                 try:
-                    print("LLM: Trying without explicit http_client...")
-                    self.client = OpenAI(api_key=api_key)
-                    print(f"LLM: OpenAI client initialized (fallback method)")
+                    logger.info("LLM: Trying without explicit http_client...")
+                    self.client = AsyncOpenAI(api_key=api_key)
+                    logger.info(f"LLM: OpenAI client initialized (fallback method)")
                 except Exception as e2:
-                    print(f"LLM: Fallback also failed: {e2}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception(f"LLM: Fallback also failed: {e2}")
                     self.client = None
     
     def _load_resume(self) -> str:
@@ -74,75 +113,189 @@ class LLMProcessor:
                 with open(resume_path, 'r', encoding='utf-8') as f:
                     return f.read()
         except Exception as e:
-            print(f"LLM: Warning - Could not load resume: {e}")
+            logger.info(f"LLM: Warning - Could not load resume: {e}")
         return ""
     
-    def process_text(self, text: str, system_prompt: Optional[str] = None) -> Optional[str]:
+    def _build_default_prompt(self) -> str:
         """
-        Send text to LLM and get response
-        Returns LLM's response or None if error
+        Assemble the default resume-aware system prompt (called once in __init__)
+
+        The resume block is placed FIRST and kept byte-identical between
+        requests (no timestamps, trailing whitespace stripped) so OpenAI's
+        automatic prompt-prefix caching can reuse its evaluation across turns
         """
-        # Load resume if not provided with system prompt
-        if system_prompt is None:
-            resume_content = self._load_resume()
-            if resume_content:
-                system_prompt = f"""You are a helpful assistant representing Uttam Giri, an IT Specialist / Developer / AI & Cloud Architect.
+        if self._resume:
+            return f"""Here is the professional background of Uttam Giri, an IT Specialist / Developer / AI & Cloud Architect:
 
-Here is Uttam's professional background:
+{self._resume.rstrip()}
 
-{resume_content}
+You are a helpful assistant representing Uttam Giri.
 
 IMPORTANT INSTRUCTIONS:
 - When asked about Uttam, his experience, skills, background, qualifications, or any questions about him personally or professionally, scan and use the resume information above to provide accurate and helpful responses.
 - For all other questions (general questions, current events, news, technology, etc.), provide normal helpful assistance using your knowledge. Answer general questions naturally without referencing the resume unless specifically asked about Uttam."""
-            else:
-                system_prompt = "You are a helpful assistant that can answer questions about current events, news, technology, and general topics."
-        # If client is None, try to reinitialize one more time
-        if not self.client:
-            print("LLM: Client is None, attempting to reinitialize...")
-            # Clear proxy vars again
-            proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'NO_PROXY', 'no_proxy', 'ALL_PROXY', 'all_proxy']
-            for proxy_var in proxy_vars:
-                if proxy_var in os.environ:
-                    del os.environ[proxy_var]
-            
-            # Try to get API key and create client
-            api_key = os.environ.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
-            if api_key:
-                try:
-                    # Explicitly disable proxies by passing http_client without proxy config
-                    import httpx
-                    http_client = httpx.Client(timeout=60.0)
-                    self.client = OpenAI(api_key=api_key, http_client=http_client)
-                    print(f"LLM: Client reinitialized successfully in process_text")
-                except Exception as e:
-                    print(f"LLM: Failed to reinitialize client: {e}")
-                    import traceback
-                    traceback.print_exc()
-            
-            if not self.client:
-                error_msg = "Error: LLM not configured. Please set OPENAI_API_KEY."
-                print(f"LLM: {error_msg}")
-                return error_msg
-        
+        return "You are a helpful assistant that can answer questions about current events, news, technology, and general topics."
+
+    def _default_system_prompt(self, system_prompt: Optional[str]) -> str:
+        """Return the cached default system prompt when none is provided"""
+        if system_prompt is None:
+            return self._default_prompt
+        return system_prompt
+
+    def _ensure_client(self) -> bool:
+        """Whether the OpenAI client is usable (no per-call reconstruction)"""
+        return self.client is not None
+
+    @staticmethod
+    def _cache_key(text: str, system_prompt: str) -> str:
+        """Cache key over the normalized user text + the system prompt in effect"""
+        h = hashlib.blake2b(text.lower().strip().encode())
+        h.update(system_prompt.encode())
+        return h.hexdigest()
+
+    async def _embed_and_store(self, text: str, key: str, answer: str):
+        """Background task: embed a fresh answer into the semantic tier"""
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.embeddings.create(
+                model="text-embedding-3-small",
+                input=text
+            )
+            self._embeds.append((np.asarray(response.data[0].embedding), key, answer))
+        except Exception as e:
+            logger.info(f"LLM: Background embedding failed (semantic tier skipped): {e}")
+
+    def _cache_store(self, key: str, answer: str, embedding=None, text: Optional[str] = None):
+        """Store an answer in the exact cache (LRU) and the embedding tier"""
+        self._exact_cache[key] = answer
+        self._exact_cache.move_to_end(key)
+        while len(self._exact_cache) > self._EXACT_CACHE_CAP:
+            self._exact_cache.popitem(last=False)
+        if embedding is not None:
+            self._embeds.append((embedding, key, answer))
+        elif text and self.client is not None:
+            # No embedding was computed during lookup (empty tier fast path):
+            # populate the semantic tier off the critical path so the caller
+            # never waits on the embedding round-trip
+            asyncio.create_task(self._embed_and_store(text, key, answer))
+
+    async def _cache_lookup(self, key: str, text: str):
+        """
+        Look up a cached answer for this utterance
+        Returns (answer or None, embedding or None) - the embedding is reused
+        for storing the fresh answer on a miss
+        """
+        hit = self._exact_cache.get(key)
+        if hit is not None:
+            self._exact_cache.move_to_end(key)
+            logger.info("LLM: Exact cache hit, skipping OpenAI call")
+            return hit, None
+
+        # Empty semantic tier (or no client): nothing to compare against, so
+        # don't pay an embedding round-trip before the completion - the fresh
+        # answer is embedded in the background by _cache_store instead
+        if not self._embeds or not self.client:
+            return None, None
+
+        # Semantic tier: embed the utterance and compare against stored answers
+        try:
+            response = await self.client.embeddings.create(
+                model="text-embedding-3-small",
+                input=text
+            )
+            embedding = np.asarray(response.data[0].embedding)
+        except Exception as e:
+            logger.info(f"LLM: Embedding lookup failed (continuing without cache): {e}")
+            return None, None
+
+        norm = np.linalg.norm(embedding)
+        best_score, best_answer = 0.0, None
+        for stored_embed, _, answer in self._embeds:
+            score = float(np.dot(embedding, stored_embed) / (norm * np.linalg.norm(stored_embed)))
+            if score > best_score:
+                best_score, best_answer = score, answer
+        if best_score > self._SEMANTIC_THRESHOLD:
+            logger.info(f"LLM: Semantic cache hit (similarity {best_score:.3f}), skipping OpenAI call")
+            return best_answer, embedding
+
+        return None, embedding
+
+    async def process_text(self, text: str, system_prompt: Optional[str] = None) -> Optional[str]:
+        """
+        Send text to LLM and get the complete response
+        Returns LLM's response or None if error
+        """
+        system_prompt = self._default_system_prompt(system_prompt)
+
+        if not self._ensure_client():
+            error_msg = "Error: LLM not configured. Please set OPENAI_API_KEY."
+            logger.info(f"LLM: {error_msg}")
+            return error_msg
+
+        key = self._cache_key(text, system_prompt)
+        cached, embedding = await self._cache_lookup(key, text)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text}
                 ],
                 temperature=0.7,
-                max_tokens=50  # Reduced for very short, concise responses
+                max_tokens=50,  # Reduced for very short, concise responses
+                user=self._PROMPT_CACHE_USER  # Stable id helps hit the same prompt-cache shard
             )
             if response.choices and len(response.choices) > 0:
                 result = response.choices[0].message.content
+                if result:
+                    self._cache_store(key, result, embedding, text)
                 return result
             else:
                 return None
         except Exception as e:
-            print(f"LLM: Error processing text with LLM: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"LLM: Error processing text with LLM: {type(e).__name__}: {e}")
             return None
 
+    async def process_text_stream(self, text: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Send text to LLM with stream=True and yield token deltas as they arrive
+        so downstream TTS can start on the first sentence instead of the full reply
+        """
+        system_prompt = self._default_system_prompt(system_prompt)
+
+        if not self._ensure_client():
+            error_msg = "Error: LLM not configured. Please set OPENAI_API_KEY."
+            logger.info(f"LLM: {error_msg}")
+            yield error_msg
+            return
+
+        key = self._cache_key(text, system_prompt)
+        cached, embedding = await self._cache_lookup(key, text)
+        if cached is not None:
+            yield cached
+            return
+
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text}
+                ],
+                temperature=0.7,
+                max_tokens=50,  # Reduced for very short, concise responses
+                user=self._PROMPT_CACHE_USER,  # Stable id helps hit the same prompt-cache shard
+                stream=True
+            )
+            pieces = []
+            async for event in response:
+                if event.choices and event.choices[0].delta.content:
+                    pieces.append(event.choices[0].delta.content)
+                    yield event.choices[0].delta.content
+            if pieces:
+                self._cache_store(key, ''.join(pieces), embedding, text)
+        except Exception as e:
+            logger.exception(f"LLM: Error streaming text with LLM: {type(e).__name__}: {e}")
+
@@ -1,7 +1,13 @@
+import asyncio
 import boto3
+import hashlib
+import logging
 import os
+from collections import OrderedDict
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 class PollySynthesizer:
     """Handles Amazon Polly text-to-speech synthesis"""
     
@@ -13,9 +19,9 @@ class PollySynthesizer:
         
         # Debug: Check if credentials are loaded
         if aws_access_key:
-            print(f"Polly: AWS credentials found (key: {aws_access_key[:8]}...)")
+            logger.info(f"Polly: AWS credentials found (key: {aws_access_key[:8]}...)")
         else:
-            print("Polly: AWS_ACCESS_KEY_ID not found, using default boto3 credential chain")
+            logger.info("Polly: AWS_ACCESS_KEY_ID not found, using default boto3 credential chain")
         
         # Create client with explicit credentials if provided, otherwise use default chain
         if aws_access_key and aws_secret_key:
@@ -30,7 +36,16 @@ class PollySynthesizer:
             self.polly_client = boto3.client('polly', region_name=region)
         
         self.voice_id = 'Joanna'  # Default voice
-        self.output_format = 'pcm'  # PCM format for streaming
+        # Output format: 'pcm' keeps raw-PCM clients working; setting
+        # POLLY_FORMAT=ogg_vorbis or mp3 cuts payloads ~10x for clients
+        # that can decode compressed audio
+        self.output_format = os.getenv('POLLY_FORMAT', 'pcm')
+
+        # LRU cache of synthesized audio - with short LLM replies the same
+        # phrases ("Hello!", resume boilerplate) recur constantly, and a
+        # cache hit replaces a Polly round-trip with a dict lookup
+        self._cache: OrderedDict[tuple, bytes] = OrderedDict()
+        self._cache_cap = 256
 
     def synthesize_speech(self, text: str, voice_id: str = '') -> Optional[bytes]:
         """
@@ -39,26 +54,52 @@ class PollySynthesizer:
         """
         try:
             voice = voice_id if voice_id else self.voice_id
-            
-            response = self.polly_client.synthesize_speech(
+            engine = 'neural' if voice_id else 'standard'
+
+            key = (hashlib.blake2b(text.encode()).digest(), voice, engine, self.output_format)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                logger.info(f"Polly: Cache hit ({len(cached)} bytes), skipping synthesis")
+                return cached
+
+            kwargs = dict(
                 Text=text,
-                OutputFormat='pcm',
+                OutputFormat=self.output_format,
                 VoiceId=voice,
-                SampleRate='16000',
-                Engine='neural' if voice_id else 'standard'
+                Engine=engine
             )
-            
-            return response['AudioStream'].read()
+            if self.output_format == 'pcm':
+                # SampleRate applies to raw PCM; compressed formats pick their own
+                kwargs['SampleRate'] = '16000'
+
+            response = self.polly_client.synthesize_speech(**kwargs)
+
+            audio = response['AudioStream'].read()
+            if audio:
+                self._cache[key] = audio
+                while len(self._cache) > self._cache_cap:
+                    self._cache.popitem(last=False)
+            return audio
         except Exception as e:
-            print(f"Error synthesizing speech: {e}")
+            logger.info(f"Error synthesizing speech: {e}")
             return None
-    
+
+    async def synthesize_speech_async(self, text: str, voice_id: str = '') -> Optional[bytes]:
+        """
+        Async wrapper around synthesize_speech
+        Runs the blocking boto3 call in a worker thread so the event loop
+        (and every other websocket connection) isn't blocked on Polly
+        """
+        return await asyncio.to_thread(self.synthesize_speech, text, voice_id)
+
+
     def get_available_voices(self) -> list:
         """Get list of available voices"""
         try:
             response = self.polly_client.describe_voices()
             return [voice['Name'] for voice in response['Voices']]
         except Exception as e:
-            print(f"Error getting voices: {e}")
+            logger.info(f"Error getting voices: {e}")
             return []
 
@@ -1,288 +1,284 @@
 import asyncio
+import logging
 import os
 import time
 from websockets.server import serve
 from websockets.exceptions import ConnectionClosedOK
-from app.audio_processor import process_audio_async, reset_session
-from app.utils import log_message
-from app.silence_detector import detect_silence_pcm16
+from app.audio_processor import create_session, close_session, process_audio_async, warmup
+from app.llm_processor import close_llm_http_client
+from app.utils import setup_async_logging
+from app.silence_detector import PCMSilenceBuffer
 from dotenv import load_dotenv
 
 # Load environment variables from .env
 load_dotenv()
 
+# Async logging: hot-path log calls only enqueue; a listener thread writes
+logger = logging.getLogger(__name__)
+_log_listener = setup_async_logging()
+
 # Enable debugpy for remote debugging if DEBUG env var is set
 if os.getenv("DEBUG", "").lower() in ("true", "1", "yes"):
     import debugpy
     debug_port = int(os.getenv("DEBUG_PORT", "5678"))
     debugpy.listen(("0.0.0.0", debug_port))
-    print(f"Debugger listening on port {debug_port}...")
+    logger.info(f"Debugger listening on port {debug_port}...")
     # Only wait for debugger if WAIT_FOR_DEBUGGER is set
     if os.getenv("WAIT_FOR_DEBUGGER", "").lower() in ("true", "1", "yes"):
         debugpy.wait_for_client()
-        print("Debugger attached! Starting server...")
+        logger.info("Debugger attached! Starting server...")
     else:
-        print("Debugger ready (not waiting). Server starting...")
+        logger.info("Debugger ready (not waiting). Server starting...")
 
 WEBSOCKET_HOST = os.getenv("WEBSOCKET_HOST", "0.0.0.0")
 WEBSOCKET_PORT = int(os.getenv("WEBSOCKET_PORT", 8765))
 
+async def _send_responses(websocket, session, accumulated_audio, label="complete response"):
+    """
+    Run the pipeline on accumulated audio and send each produced piece as a
+    single binary frame. The one send path shared by all three flush sites
+    (pause watcher, silence detection, final flush), so send-side tuning
+    happens in exactly one place.
+    """
+    async for processed_chunk in process_audio_async(session, accumulated_audio):
+        if processed_chunk and len(processed_chunk) > 0:
+            # One frame per response: the server runs with max_size=None,
+            # and a single send avoids per-slice frame + syscall cost
+            await websocket.send(processed_chunk)
+            logger.info(f"Sent {label}: {len(processed_chunk)} bytes")
+
 async def connect_handler(websocket, path):
     """Handles each WebSocket connection with pause detection"""
-    print("New WebSocket session started")
-    
-    # Reset session for new connection
-    reset_session()
-    
-    # Initialize services (stream will be started when needed)
-    from app.audio_processor import _initialize_services
-    _initialize_services()
-    
-    # Audio buffer to accumulate chunks
-    audio_buffer = b''
-    silence_buffer = b''  # Buffer to accumulate silent chunks
-    last_sound_time = None
+    logger.info("New WebSocket session started")
+
+    # Per-connection pipeline state: each websocket gets its own Transcriber
+    # and Transcribe stream, while LLM/Polly services are shared (stateless).
+    # Shared services are pre-warmed at server startup (see warmup() in main).
+    session = create_session()
+
     pause_detection_threshold = 1.5  # seconds of silence before processing
     sample_rate = 16000
     silence_threshold = 2000  # Amplitude threshold (higher = filters more background noise)
     min_audio_duration = 0.5  # Minimum audio duration to process (seconds)
-    process_task = None
+    # Hoisted threshold constants in integer sample counts: the per-chunk
+    # comparisons below avoid floating-point division entirely; durations in
+    # seconds are only computed when a log line needs them
+    MIN_AUDIO_SAMPLES = int(min_audio_duration * sample_rate)
+    PAUSE_SILENCE_SAMPLES = int(pause_detection_threshold * sample_rate)
+    PAUSE_NS = int(pause_detection_threshold * 1e9)
+    # Backpressure cap: an utterance is force-processed at 30s so a stuck
+    # open mic can't grow the buffer (and first-response latency) without
+    # bound while sound keeps arriving
+    MAX_UTTERANCE_SAMPLES = 30 * sample_rate
+    # Fused accumulate + silence-detect: one NumPy pass per chunk stores the
+    # samples in a pre-allocated int16 ring buffer and computes the verdict
+    pcm = PCMSilenceBuffer(sample_rate=sample_rate, silence_threshold=silence_threshold)
+    # Pause detection uses one long-lived watcher task reading a deadline
+    # instead of creating/cancelling a task per incoming chunk
+    pause_deadline = None  # monotonic_ns time at which to process; None = idle
+    pause_wake = asyncio.Event()  # wakes the watcher when a deadline is (re)armed
     is_processing = False  # Flag to prevent multiple simultaneous processing
 
-    async def process_on_pause():
-        """Process accumulated audio after continuous silence"""
-        nonlocal audio_buffer, silence_buffer, last_sound_time, is_processing
-        
-        # Wait for pause threshold
-        await asyncio.sleep(pause_detection_threshold)
-        
-        # Double-check: if no new audio arrived and we're not already processing, process
-        current_time = time.time()
-        if last_sound_time and (current_time - last_sound_time) >= pause_detection_threshold:
+    async def pause_watcher():
+        """Single long-lived task: process accumulated audio when the pause deadline passes"""
+        nonlocal pause_deadline, is_processing
+
+        while True:
+            if pause_deadline is None:
+                pause_wake.clear()
+                await pause_wake.wait()
+                continue
+
+            wait = (pause_deadline - time.monotonic_ns()) * 1e-9
+            if wait > 0:
+                # Sleep toward the deadline; a new chunk just pushes the
+                # deadline forward, no cancellation needed
+                await asyncio.sleep(max(0.05, wait))
+                continue
+
+            pause_deadline = None
+
             # Check if already processing to avoid duplicate processing
             if is_processing:
-                print("Already processing, skipping duplicate pause detection")
-                return
-            
-            # Check minimum audio duration
-            audio_duration = len(audio_buffer) / (sample_rate * 2)  # 2 bytes per sample
-            
-            if len(audio_buffer) > 0 and audio_duration >= min_audio_duration:
+                logger.info("Already processing, skipping duplicate pause detection")
+                continue
+
+            if pcm.voiced_idx >= MIN_AUDIO_SAMPLES:
                 is_processing = True  # Set flag to prevent duplicate processing
-                print(f"Pause detected (1.5s silence), processing {len(audio_buffer)} bytes ({audio_duration:.2f}s)...")
-                accumulated_audio = audio_buffer
-                audio_buffer = b''  # Clear buffer
-                silence_buffer = b''
+                logger.info(f"Pause detected (1.5s silence), processing {pcm.voiced_bytes} bytes ({pcm.voiced_seconds:.2f}s)...")
+                accumulated_audio = pcm.flush()
                 
                 try:
                     # Process audio through Transcribe -> LLM -> Polly pipeline
-                    processed_chunk = await process_audio_async(accumulated_audio)
-                    
-                    # Send processed chunk back (chunk if large)
-                    if processed_chunk and len(processed_chunk) > 0:
-                        max_chunk_size = 512 * 1024  # 512KB chunks
-                        if len(processed_chunk) > max_chunk_size:
-                            print(f"Large response ({len(processed_chunk)} bytes), splitting into chunks...")
-                            total_chunks = (len(processed_chunk) + max_chunk_size - 1) // max_chunk_size
-                            for i in range(0, len(processed_chunk), max_chunk_size):
-                                chunk = processed_chunk[i:i + max_chunk_size]
-                                await websocket.send(chunk)
-                                print(f"Sent chunk {i // max_chunk_size + 1}/{total_chunks}: {len(chunk)} bytes")
-                        else:
-                            await websocket.send(processed_chunk)
-                            print(f"Sent complete response: {len(processed_chunk)} bytes")
+                    # Stages overlap, so send each audio piece as soon as it's ready
+                    await _send_responses(websocket, session, accumulated_audio)
                 finally:
                     is_processing = False  # Clear flag after processing completes
-            elif len(audio_buffer) > 0:
-                print(f"Audio too short ({audio_duration:.2f}s < {min_audio_duration}s), ignoring...")
-                audio_buffer = b''
+            elif pcm.voiced_idx > 0:
+                logger.info(f"Audio too short ({pcm.voiced_seconds:.2f}s < {min_audio_duration}s), ignoring...")
+                pcm.reset()
+
+    watcher_task = asyncio.create_task(pause_watcher())
 
     try:
         chunk_count = 0
         async for message in websocket:
             try:
                 chunk_count += 1
-                # Only log every 20th chunk to reduce noise
-                if chunk_count % 20 == 0:
-                    log_message(f"Received {chunk_count} audio chunks ({len(message)} bytes each)")
+                # Chunk-count progress is debug-only; the level gate skips
+                # even the lazy formatting when debug logging is off
+                if chunk_count % 20 == 0 and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Received %d audio chunks (%d bytes each)", chunk_count, len(message))
                 
-                # Check if this chunk contains actual sound
+                # Store the chunk and classify it in one fused pass.
+                # Typical mic frames are a few KB and run inline; unusually
+                # large chunks go to a worker thread so the event loop stays
+                # responsive to other connections
                 try:
-                    is_silent_chunk, _ = detect_silence_pcm16(
-                        message, 
-                        sample_rate=sample_rate,
-                        silence_threshold=silence_threshold,
-                        min_silence_duration=0.1  # Just check if chunk is silent
-                    )
+                    if len(message) >= 32768:
+                        is_silent_chunk = await asyncio.to_thread(pcm.append, message)
+                    else:
+                        is_silent_chunk = pcm.append(message)
                 except Exception as detect_error:
-                    print(f"Error in silence detection: {detect_error}")
+                    logger.info(f"Error in silence detection: {detect_error}")
                     # Assume non-silent if detection fails
                     is_silent_chunk = False
-                
+
                 if is_silent_chunk:
-                    # Silent chunk - accumulate to silence buffer
-                    silence_buffer += message
-                    silence_duration = len(silence_buffer) / (sample_rate * 2)
-                    
                     # If we have audio accumulated and silence is long enough, process it
-                    if len(audio_buffer) > 0 and silence_duration >= pause_detection_threshold:
-                        audio_duration = len(audio_buffer) / (sample_rate * 2)
+                    if pcm.voiced_idx > 0 and pcm.trailing_samples >= PAUSE_SILENCE_SAMPLES:
                         
                         # Check if already processing to avoid duplicate processing
                         if is_processing:
-                            print("Already processing, skipping duplicate silence detection")
-                            # Continue accumulating silence, cancel any pending timeout
-                            if process_task and not process_task.done():
-                                process_task.cancel()
-                                try:
-                                    await process_task
-                                except asyncio.CancelledError:
-                                    pass
+                            logger.info("Already processing, skipping duplicate silence detection")
+                            # Continue accumulating silence, disarm the pause deadline
+                            pause_deadline = None
                             continue
                         
-                        if audio_duration >= min_audio_duration:
+                        if pcm.voiced_idx >= MIN_AUDIO_SAMPLES:
                             is_processing = True  # Set flag to prevent duplicate processing
-                            print(f"Silence detected ({silence_duration:.2f}s), processing {len(audio_buffer)} bytes...")
-                            
-                            accumulated_audio = audio_buffer
-                            audio_buffer = b''
-                            silence_buffer = b''
-                            
-                            # Cancel pending timeout task
-                            if process_task and not process_task.done():
-                                process_task.cancel()
-                                try:
-                                    await process_task
-                                except asyncio.CancelledError:
-                                    pass
+                            logger.info(f"Silence detected ({pcm.trailing_silence_seconds:.2f}s), processing {pcm.voiced_bytes} bytes...")
+
+                            accumulated_audio = pcm.flush()
+
+                            # Disarm the pause deadline - we're processing now
+                            pause_deadline = None
                             
                             # Process audio
                             try:
-                                processed_chunk = await process_audio_async(accumulated_audio)
-                                if processed_chunk and len(processed_chunk) > 0:
-                                    # Split large responses into chunks to avoid WebSocket message size limits (typically 1MB)
-                                    max_chunk_size = 512 * 1024  # 512KB chunks
-                                    if len(processed_chunk) > max_chunk_size:
-                                        print(f"Large response ({len(processed_chunk)} bytes), splitting into chunks...")
-                                        total_chunks = (len(processed_chunk) + max_chunk_size - 1) // max_chunk_size
-                                        for i in range(0, len(processed_chunk), max_chunk_size):
-                                            chunk = processed_chunk[i:i + max_chunk_size]
-                                            await websocket.send(chunk)
-                                            print(f"Sent chunk {i // max_chunk_size + 1}/{total_chunks}: {len(chunk)} bytes")
-                                    else:
-                                        await websocket.send(processed_chunk)
-                                        print(f"Sent complete response: {len(processed_chunk)} bytes")
+                                await _send_responses(websocket, session, accumulated_audio)
                             except Exception as process_error:
                                 error_type = type(process_error).__name__
                                 if "ConnectionClosed" in error_type:
-                                    print(f"Connection closed while sending response: {process_error}")
+                                    logger.info(f"Connection closed while sending response: {process_error}")
                                     raise  # Re-raise to exit the loop
                                 else:
-                                    print(f"Error processing audio: {process_error}")
-                                    import traceback
-                                    traceback.print_exc()
+                                    logger.exception(f"Error processing audio: {process_error}")
                                     # Continue - don't close connection on processing errors
                             finally:
                                 is_processing = False  # Clear flag after processing completes
                         else:
-                            print(f"Audio too short ({audio_duration:.2f}s), continuing to accumulate...")
+                            logger.info(f"Audio too short ({pcm.voiced_seconds:.2f}s), continuing to accumulate...")
                     else:
-                        # Continue accumulating silence, cancel any pending timeout
-                        if process_task and not process_task.done():
-                            process_task.cancel()
-                            try:
-                                await process_task
-                            except asyncio.CancelledError:
-                                pass
+                        # Continue accumulating silence, disarm the pause deadline
+                        pause_deadline = None
                 else:
-                    # Sound detected - add to audio buffer and reset silence
-                    audio_buffer += silence_buffer  # Include any leading silence
-                    audio_buffer += message
-                    silence_buffer = b''
-                    last_sound_time = time.time()
-                    
-                    # Cancel any pending pause processing
-                    if process_task and not process_task.done():
-                        process_task.cancel()
+                    # Sound detected - pcm.append already folded any leading
+                    # silence into the speech region in the same pass
+
+                    # Push the pause deadline forward and wake the watcher
+                    # (monotonic_ns: integer add, immune to wall-clock jumps)
+                    pause_deadline = time.monotonic_ns() + PAUSE_NS
+                    pause_wake.set()
+
+                    # Hard cap reached: flush now instead of waiting for a pause
+                    if pcm.voiced_idx >= MAX_UTTERANCE_SAMPLES and not is_processing:
+                        is_processing = True
+                        logger.info(f"Max utterance length reached ({pcm.voiced_seconds:.0f}s), processing {pcm.voiced_bytes} bytes...")
+                        accumulated_audio = pcm.flush()
+                        pause_deadline = None
                         try:
-                            await process_task
-                        except asyncio.CancelledError:
-                            pass
-                    
-                    # Start new timeout task for pause detection
-                    process_task = asyncio.create_task(process_on_pause())
+                            await _send_responses(websocket, session, accumulated_audio)
+                        except Exception as process_error:
+                            error_type = type(process_error).__name__
+                            if "ConnectionClosed" in error_type:
+                                logger.info(f"Connection closed while sending response: {process_error}")
+                                raise  # Re-raise to exit the loop
+                            else:
+                                logger.exception(f"Error processing audio: {process_error}")
+                                # Continue - don't close connection on processing errors
+                        finally:
+                            is_processing = False
             except Exception as message_error:
                 error_type = type(message_error).__name__
                 if "ConnectionClosed" in error_type:
                     raise  # Re-raise connection closed errors to exit loop
                 else:
-                    print(f"Error processing message: {message_error}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception(f"Error processing message: {message_error}")
                     # Continue processing other messages
                     continue
         
         # Process any remaining audio when connection closes
-        if len(audio_buffer) > 0:
-            print(f"Processing final {len(audio_buffer)} bytes of audio...")
+        if pcm.voiced_bytes > 0:
+            logger.info(f"Processing final {pcm.voiced_bytes} bytes of audio...")
             try:
-                processed_chunk = await process_audio_async(audio_buffer)
-                if processed_chunk and len(processed_chunk) > 0:
-                    # Split large responses into chunks
-                    max_chunk_size = 512 * 1024  # 512KB chunks
-                    if len(processed_chunk) > max_chunk_size:
-                        print(f"Large final response ({len(processed_chunk)} bytes), splitting into chunks...")
-                        total_chunks = (len(processed_chunk) + max_chunk_size - 1) // max_chunk_size
-                        for i in range(0, len(processed_chunk), max_chunk_size):
-                            chunk = processed_chunk[i:i + max_chunk_size]
-                            await websocket.send(chunk)
-                            print(f"Sent final chunk {i // max_chunk_size + 1}/{total_chunks}: {len(chunk)} bytes")
-                    else:
-                        await websocket.send(processed_chunk)
-                        print(f"Sent final response: {len(processed_chunk)} bytes")
+                await _send_responses(websocket, session, pcm.flush(), label="final response")
             except Exception as final_error:
                 error_type = type(final_error).__name__
                 if "ConnectionClosed" not in error_type:
-                    print(f"Error processing final audio: {final_error}")
+                    logger.info(f"Error processing final audio: {final_error}")
 
     except ConnectionClosedOK:
-        print("WebSocket session ended normally")
+        logger.info("WebSocket session ended normally")
     except Exception as e:
         error_type = type(e).__name__
         if "ConnectionClosed" in error_type or "ConnectionClosedError" in error_type:
-            print(f"WebSocket connection closed: {e}")
+            logger.info(f"WebSocket connection closed: {e}")
         else:
-            print(f"Error in connection handler: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error in connection handler: {e}")
             # Don't re-raise - let connection close gracefully
     finally:
-        # Cleanup: Close transcription stream when WebSocket session ends
-        from app.audio_processor import _transcriber
-        if _transcriber and _transcriber.is_streaming:
-            print("Closing transcription stream for this session...")
-            _transcriber.is_streaming = False
-            _transcriber.stream = None
-            if _transcriber._result_processor_task and not _transcriber._result_processor_task.done():
-                _transcriber._result_processor_task.cancel()
-                _transcriber._result_processor_task = None
+        # Stop the pause watcher and tear down the transcriber/keep-alive
+        # concurrently - they share nothing once the watcher is cancelled,
+        # and overlapping them shaves a network round-trip off every close
+        watcher_task.cancel()
+        await asyncio.gather(watcher_task, close_session(session), return_exceptions=True)
+        logger.info("WebSocket session cleanup complete")
 
 async def main():
     """Start the WebSocket server"""
+    # Pre-warm Transcribe/LLM/Polly clients so the first connection doesn't
+    # pay for client construction and connection handshakes
+    await warmup()
+
     # Configure longer ping interval and timeout for audio streaming
     # This prevents timeout during long pauses in speech
     server = await serve(
         connect_handler, 
         WEBSOCKET_HOST, 
         WEBSOCKET_PORT,
-        ping_interval=30,  # Send ping every 30 seconds
-        ping_timeout=60,   # Wait 60 seconds for pong response
+        ping_interval=60,  # Ping every 60s: halves ping/pong handling and keeps
+                           # keepalive frames out of bursty audio sends
+        ping_timeout=120,  # Wait 120 seconds for pong response
         close_timeout=10,  # Close timeout
         max_size=None,     # Disable message size limit (we'll chunk manually)
-        max_queue=32       # Queue size for messages
+        max_queue=32,      # Queue size for messages
+        subprotocols=["audio.pcm16"]  # Binary PCM16 channel; clients that
+                                      # negotiate it never send text frames
     )
-    print(f"WebSocket server listening on {WEBSOCKET_HOST}:{WEBSOCKET_PORT}")
-    await server.wait_closed()
+    logger.info(f"WebSocket server listening on {WEBSOCKET_HOST}:{WEBSOCKET_PORT}")
+    try:
+        await server.wait_closed()
+    finally:
+        # Shutdown hook: drain the shared LLM HTTP connection pool
+        await close_llm_http_client()
 
 if __name__ == "__main__":
+    # uvloop cuts task-scheduling and socket I/O overhead on the busy
+    # per-chunk paths; fall back to the stdlib loop where unavailable
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
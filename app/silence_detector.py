@@ -1,12 +1,18 @@
 """Silence detection for PCM16 audio streams"""
-import struct
+import math
+import numpy as np
 from typing import Tuple
 
-def detect_silence_pcm16(audio_bytes: bytes, sample_rate: int = 16000, 
+from app.silence_kernels import rms_and_silent
+
+def detect_silence_pcm16(audio_bytes: bytes, sample_rate: int = 16000,
                         silence_threshold: int = 2000, min_silence_duration: float = 0.1) -> Tuple[bool, int]:
     """
     Detect silence in PCM16 audio stream
-    
+
+    Vectorized with NumPy: the chunk is viewed as an int16 array and the
+    RMS/threshold math runs in C instead of a per-sample Python loop.
+
     Args:
         audio_bytes: PCM16 audio bytes (16-bit signed integers, little-endian)
         sample_rate: Sample rate in Hz (default 16000)
@@ -15,7 +21,7 @@ def detect_silence_pcm16(audio_bytes: bytes, sample_rate: int = 16000,
         min_silence_duration: Minimum duration of silence in seconds (default 0.1)
                               Used for per-chunk detection, actual pause detection
                               happens at server level
-    
+
     Returns:
         Tuple[bool, int]: (is_silent, silence_samples_count)
         - is_silent: True if chunk is mostly silent
@@ -23,30 +29,121 @@ def detect_silence_pcm16(audio_bytes: bytes, sample_rate: int = 16000,
     """
     if len(audio_bytes) < 2:
         return True, 0  # Empty or too small = consider silent
-    
-    # Convert bytes to 16-bit signed integers
-    samples = []
-    for i in range(0, len(audio_bytes) - 1, 2):
-        try:
-            sample = struct.unpack('<h', audio_bytes[i:i+2])[0]
-            samples.append(abs(sample))
-        except:
-            continue
-    
-    if not samples:
+
+    # View bytes as 16-bit signed integers (drop any trailing odd byte)
+    usable = len(audio_bytes) - (len(audio_bytes) % 2)
+    samples = np.frombuffer(audio_bytes, dtype='<i2', count=usable // 2)
+
+    if samples.size == 0:
         return True, 0
-    
+
+    # Early exit on the common case (speech): if a 10ms prefix already
+    # clears the threshold with room to spare, skip the full-chunk scan
+    if int(np.abs(samples[:160]).max()) >= silence_threshold * 2:
+        return False, 0
+
+    # Fused kernel: squared sum + silent count in one pass over the view
+    # (JIT-compiled to SIMD when numba is installed, NumPy otherwise)
+    sumsq, silent_samples, n = rms_and_silent(samples, silence_threshold)
+
     # Calculate RMS (Root Mean Square) amplitude for better noise filtering
-    if samples:
-        rms = (sum(s * s for s in samples) / len(samples)) ** 0.5
-    else:
-        rms = 0
-    
+    rms = math.sqrt(sumsq / n)
+
     # Use RMS for more robust silence detection
     is_silent_chunk = rms < silence_threshold
-    
-    # Count silent samples
-    silent_samples = sum(1 for amp in samples if amp < silence_threshold)
-    
-    return is_silent_chunk, silent_samples
 
+    return is_silent_chunk, int(silent_samples)
+
+
+class PCMSilenceBuffer:
+    """
+    Fused accumulation + silence detection for a PCM16 stream
+
+    Incoming chunks are viewed once with np.frombuffer; the same pass stores
+    the samples into a pre-allocated int16 ring buffer and computes the RMS
+    silence verdict, instead of appending to a bytes buffer and re-scanning
+    it downstream.
+
+    Layout: ring[:voiced_idx] is speech (including any interleaved silence up
+    to the last sound chunk); ring[voiced_idx:write_idx] is a short stored
+    silence tail that is folded into the speech region if sound resumes.
+    Silence beyond that context window is counted (trailing_samples) but not
+    stored, so a long pause never fills the ring.
+    """
+
+    def __init__(self, sample_rate: int = 16000, silence_threshold: int = 2000,
+                 max_seconds: int = 60, silence_context_seconds: float = 0.3):
+        self.sample_rate = sample_rate
+        self.silence_threshold = silence_threshold
+        self.ring = np.empty(sample_rate * max_seconds, dtype=np.int16)
+        self.write_idx = 0   # Total samples stored (speech + silence context)
+        self.voiced_idx = 0  # Samples up to and including the last sound chunk
+        # Silence duration is tracked as a counter; only ~300ms of it is
+        # actually stored as context, so long pauses cost no memory
+        self.trailing_samples = 0
+        self._silence_store_cap = int(silence_context_seconds * sample_rate)
+
+    def append(self, message: bytes) -> bool:
+        """
+        Store one chunk and classify it in a single pass
+        Returns True if the chunk is silent
+        """
+        usable = len(message) - (len(message) % 2)
+        if usable == 0:
+            return True
+        v = np.frombuffer(message, dtype='<i2', count=usable // 2)
+
+        # Early exit on the common case (speech): a loud 10ms prefix decides
+        # the verdict without scanning the rest of the chunk
+        if int(np.abs(v[:160]).max()) >= self.silence_threshold * 2:
+            is_silent = False
+        else:
+            # Silence verdict from the same view - no second scan, no temporaries
+            sumsq, _, n = rms_and_silent(v, self.silence_threshold)
+            is_silent = math.sqrt(sumsq / n) < self.silence_threshold
+
+        if is_silent:
+            self.trailing_samples += v.size
+            # Keep only a short silence tail in the ring as context for the
+            # next utterance; beyond the cap, silence is counted, not stored
+            if self.write_idx - self.voiced_idx >= self._silence_store_cap:
+                return True
+
+        # Store into the pre-allocated ring (clamp if full)
+        n = min(v.size, self.ring.size - self.write_idx)
+        if n > 0:
+            self.ring[self.write_idx:self.write_idx + n] = v[:n]
+            self.write_idx += n
+
+        if not is_silent:
+            # Sound: stored silence context becomes part of the speech region
+            self.voiced_idx = self.write_idx
+            self.trailing_samples = 0
+        return is_silent
+
+    @property
+    def voiced_seconds(self) -> float:
+        """Duration of accumulated speech (seconds)"""
+        return self.voiced_idx / self.sample_rate
+
+    @property
+    def trailing_silence_seconds(self) -> float:
+        """Duration of silence since the last sound chunk (seconds)"""
+        return self.trailing_samples / self.sample_rate
+
+    @property
+    def voiced_bytes(self) -> int:
+        """Size of the accumulated speech region in bytes"""
+        return self.voiced_idx * 2
+
+    def flush(self) -> bytes:
+        """Return the speech region as bytes and reset the buffer"""
+        audio = self.ring[:self.voiced_idx].tobytes()
+        self.reset()
+        return audio
+
+    def reset(self):
+        """Drop all accumulated audio"""
+        self.write_idx = 0
+        self.voiced_idx = 0
+        self.trailing_samples = 0
@@ -0,0 +1,41 @@
+"""Single-pass silence kernels, JIT-compiled with Numba when available"""
+import numpy as np
+
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+
+def _rms_and_silent_py(buf: np.ndarray, thr: int):
+    """NumPy fallback: same result as the JIT kernel, with temporaries"""
+    amplitudes = np.abs(buf.astype(np.int64))
+    sumsq = int(np.sum(amplitudes * amplitudes))
+    silent = int(np.count_nonzero(amplitudes < thr))
+    return sumsq, silent, buf.size
+
+
+if _HAVE_NUMBA:
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def rms_and_silent(buf, thr):
+        """
+        One fused pass over an int16 sample view: accumulate the squared sum
+        and the silent-sample count without allocating temporaries.
+        Returns (sum_of_squares, silent_count, sample_count).
+        """
+        sumsq = np.int64(0)
+        silent = np.int64(0)
+        for i in range(buf.size):
+            v = np.int64(buf[i])
+            s = v if v >= 0 else -v
+            sumsq += v * v
+            if s < thr:
+                silent += 1
+        return sumsq, silent, buf.size
+
+    # Warm the JIT cache with a tiny call so the first real websocket
+    # message doesn't pay compilation latency
+    rms_and_silent(np.zeros(1, dtype=np.int16), 1)
+else:
+    rms_and_silent = _rms_and_silent_py
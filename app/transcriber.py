@@ -1,105 +1,189 @@
-import boto3
-import json
 import asyncio
+import collections
+import io
+import logging
+import threading
+import time
 from typing import Optional
 import os
+import numpy as np
 from amazon_transcribe.client import TranscribeStreamingClient
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
 
+# Fixed Transcribe frame size: 20ms of 16kHz PCM16 mono. Deterministic frame
+# boundaries keep ingest latency predictable and let the send path reuse
+# fixed-size buffers
+FRAME_BYTES = int(16000 * 0.02) * 2
+
+# Coalesce whole frames into one send_audio_event: fewer event-stream
+# envelopes and write syscalls. 12 frames = 240ms per event, staying under
+# Transcribe's ~250ms-per-event soft limit
+MAX_EVENT_BYTES = FRAME_BYTES * 12
+
+logger = logging.getLogger(__name__)
+
+# One-time proxy cleanup at import: proxy settings break amazon-transcribe's
+# CRT transport, and every os.environ mutation calls putenv(3) and rebuilds
+# the environ block, so this must not run once per websocket session
+for _proxy_var in ('HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy',
+                   'NO_PROXY', 'no_proxy', 'ALL_PROXY', 'all_proxy'):
+    if os.environ.pop(_proxy_var, None) is not None:
+        logger.info(f"Removed {_proxy_var} from environment")
+
+class _FramePool:
+    """
+    Pool of reusable fixed-size frame buffers for the send path
+    At 50 frames/second, recycling buffers instead of allocating a fresh
+    bytes object per frame takes allocator churn out of the hot loop.
+    """
+
+    def __init__(self, size: int, n: int):
+        self._size = size
+        self._q = collections.deque(bytearray(size) for _ in range(n))
+
+    def acquire(self) -> bytearray:
+        try:
+            return self._q.popleft()
+        except IndexError:
+            return bytearray(self._size)
+
+    def release(self, buf: bytearray):
+        self._q.append(buf)
+
 class Transcriber:
     """Handles AWS Transcribe Streaming for real-time audio transcription"""
-    
+
+    # Shared streaming clients, one per region: constructing a client builds
+    # an HTTP/2 pool, TLS context and credential resolver, which is too much
+    # setup to repeat for every websocket session. Streams stay per-instance.
+    _clients = {}
+    _clients_lock = threading.Lock()
+
+    # Constant stream parameters, built once instead of per reconnect
+    # (Transcribe caps sessions, so long-lived servers reconnect regularly)
+    _STREAM_KWARGS = {'media_sample_rate_hz': 16000, 'media_encoding': 'pcm'}
+
+    @classmethod
+    def _get_client(cls, region: str) -> TranscribeStreamingClient:
+        client = cls._clients.get(region)
+        if client is None:
+            with cls._clients_lock:
+                client = cls._clients.get(region)
+                if client is None:
+                    client = TranscribeStreamingClient(region=region)
+                    cls._clients[region] = client
+        return client
+
     def __init__(self):
+        # Construction stays cheap: the streaming client is resolved lazily
+        # on first stream start (see _ensure_client), keeping network/TLS
+        # setup off the websocket accept path
         self.region = os.getenv('AWS_REGION', 'us-east-1')
-        
-        # Get AWS credentials from environment
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        aws_session_token = os.getenv('AWS_SESSION_TOKEN')
-        
-        # Debug: Check if credentials are loaded
-        if aws_access_key:
-            print(f"Transcriber: AWS credentials found (key: {aws_access_key[:8]}...)")
+        self.transcribe_client = None
+
+        # Session transcript accumulates in a StringIO: one write per final
+        # result, and get_transcription is a cheap getvalue() instead of
+        # re-joining every past segment
+        self._transcript_io = io.StringIO()
+        self.language_code = 'en-US'
+        self.stream = None
+        self.stream_handler = None
+        # Single-producer/single-consumer handoff: a plain deque plus an
+        # Event wakeup is cheaper than asyncio.Queue's future per get/put,
+        # and partials can arrive 10+ times a second
+        self._results = collections.deque(maxlen=256)
+        self._results_evt = asyncio.Event()
+        self.audio_buffer = []
+        self.is_streaming = False
+        self._result_processor_task = None  # Track the background task
+        # Carry-over for the fixed-size re-chunker: samples that don't fill a
+        # whole frame wait here for the next chunk
+        self._carry = bytearray()
+        self._pool = _FramePool(MAX_EVENT_BYTES, 16)
+        # Serialize stream starts: two coroutines racing past the
+        # is_streaming check would each open a billable AWS stream
+        self._start_lock = asyncio.Lock()
+        self._last_exc_log = 0.0  # rate limit for full-traceback logging
+        # RMS gate: chunks quieter than this never touch the paid stream
+        self._vad_threshold = float(os.getenv('TRANSCRIBE_VAD_RMS', '200'))
+        # Dedicated loop for sync callers: one event loop for the lifetime of
+        # the transcriber instead of a fresh loop (and fresh connection state)
+        # per send_audio_chunk call
+        self._loop = None
+        self._loop_thread = None
+    
+    async def _ensure_client(self) -> bool:
+        """
+        Resolve the shared streaming client on first use
+        Returns True if a client is available.
+        """
+        if self.transcribe_client is not None:
+            return True
+
+        # Debug: Check if credentials are loaded. No os.environ writes here:
+        # dotenv already populated the environment the credential chain reads
+        if os.getenv('AWS_ACCESS_KEY_ID'):
+            logger.info(f"Transcriber: AWS credentials found (key: {os.getenv('AWS_ACCESS_KEY_ID')[:8]}...)")
         else:
-            print("Transcriber: AWS_ACCESS_KEY_ID not found, using default boto3 credential chain")
-        
-        # Create boto3 session with credentials to ensure they're available
-        if aws_access_key and aws_secret_key:
-            session = boto3.Session(
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=self.region
-            )
-            # Set credentials in environment for amazon-transcribe library
-            os.environ['AWS_ACCESS_KEY_ID'] = aws_access_key
-            os.environ['AWS_SECRET_ACCESS_KEY'] = aws_secret_key
-            if aws_session_token:
-                os.environ['AWS_SESSION_TOKEN'] = aws_session_token
-            os.environ['AWS_REGION'] = self.region
-        
-        # Initialize Transcribe Streaming Client
-        # Clear any proxy settings that might cause issues with amazon-transcribe
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'NO_PROXY', 'no_proxy', 'ALL_PROXY', 'all_proxy']
-        for proxy_var in proxy_vars:
-            if proxy_var in os.environ:
-                del os.environ[proxy_var]
-                print(f"Removed {proxy_var} from environment")
-        
+            logger.info("Transcriber: AWS_ACCESS_KEY_ID not found, using default boto3 credential chain")
+
         # amazon-transcribe uses boto3 credential chain from environment variables
         try:
-            self.transcribe_client = TranscribeStreamingClient(region=self.region)
-            print("TranscribeStreamingClient initialized successfully")
+            self.transcribe_client = self._get_client(self.region)
+            logger.info("TranscribeStreamingClient ready (shared per region)")
         except (TypeError, ValueError) as e:
             if 'proxies' in str(e).lower():
-                print(f"Warning: amazon-transcribe library proxies error (even after clearing). Disabling transcription.")
+                logger.info(f"Warning: amazon-transcribe library proxies error (even after clearing). Disabling transcription.")
                 self.transcribe_client = None
             else:
                 raise
         except Exception as e:
-            print(f"Error initializing TranscribeStreamingClient: {e}")
-            print("Note: amazon-transcribe library will use boto3 credential chain from environment")
+            logger.info(f"Error initializing TranscribeStreamingClient: {e}")
+            logger.info("Note: amazon-transcribe library will use boto3 credential chain from environment")
             # Fallback: will use default credential chain
             self.transcribe_client = None
-        
-        self.transcription_buffer = []
-        self.language_code = 'en-US'
-        self.stream = None
-        self.stream_handler = None
-        self.results_queue = asyncio.Queue()
-        self.audio_buffer = []
-        self.is_streaming = False
-        self._result_processor_task = None  # Track the background task
-    
+        return self.transcribe_client is not None
+
     def start_transcription(self, language_code: str = 'en-US') -> Optional[dict]:
         """Start a new transcription session"""
         try:
-            print("Starting transcription session")
+            logger.info("Starting transcription session")
             self.language_code = language_code
             self.audio_buffer = []
-            self.transcription_buffer = []
+            self._transcript_io = io.StringIO()
+            self._carry.clear()
             self.is_streaming = False
             return {"status": "ready"}
         except Exception as e:
-            print(f"Error starting transcription: {e}")
+            logger.info(f"Error starting transcription: {e}")
             return None
     
     async def _start_stream_async(self):
         """Start the async transcription stream"""
+        # Double-checked locking: the unlocked fast path covers the common
+        # case (stream already up); the re-check under the lock stops two
+        # concurrent senders from both opening a stream
+        if self.is_streaming and self.stream:
+            return
+        async with self._start_lock:
+            await self._start_stream_locked()
+
+    async def _start_stream_locked(self):
         try:
             # If stream is already running, don't start a new one
             if self.is_streaming and self.stream:
-                print("Stream already running, skipping start")
+                logger.info("Stream already running, skipping start")
                 return
-            
+
             # Clean up any existing stream first
             if self.stream:
-                print("Closing existing stream before starting new one...")
+                logger.info("Closing existing stream before starting new one...")
                 self.is_streaming = False
                 self.stream = None
             
             if self._result_processor_task and not self._result_processor_task.done():
-                print("Cancelling old result processor task...")
+                logger.info("Cancelling old result processor task...")
                 self._result_processor_task.cancel()
                 try:
                     # Wait a bit for task to cancel, but don't wait too long
@@ -108,43 +192,39 @@ class Transcriber:
                     pass
                 self._result_processor_task = None
             
-            # Clear results queue to remove any stale results
-            while not self.results_queue.empty():
-                try:
-                    self.results_queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
-            
-            if not self.transcribe_client:
-                print("Transcribe client not initialized, cannot start stream")
+            # Clear any stale results
+            self._results.clear()
+            self._results_evt.clear()
+
+            if not await self._ensure_client():
+                logger.info("Transcribe client not initialized, cannot start stream")
                 return
                 
             try:
-                print(f"Calling AWS Transcribe Streaming API to start stream...")
-                print(f"  Language: {self.language_code}, Sample Rate: 16000, Encoding: pcm")
+                logger.info(f"Calling AWS Transcribe Streaming API to start stream...")
+                logger.info(f"  Language: {self.language_code}, Sample Rate: 16000, Encoding: pcm")
                 self.stream = await self.transcribe_client.start_stream_transcription(
                     language_code=self.language_code,
-                    media_sample_rate_hz=16000,
-                    media_encoding='pcm'
+                    **self._STREAM_KWARGS
                 )
-                print("AWS Transcribe stream connection established!")
+                logger.info("AWS Transcribe stream connection established!")
                 
                 # Start background task to process results
                 self._result_processor_task = asyncio.create_task(self._process_stream_results())
-                print("Started background task to receive transcription results")
+                logger.info("Started background task to receive transcription results")
                 
                 self.is_streaming = True
-                print("Transcribe stream started successfully - ready to receive audio")
+                logger.info("Transcribe stream started successfully - ready to receive audio")
             except TypeError as e:
                 if 'proxies' in str(e):
-                    print(f"Warning: amazon-transcribe library version issue (proxies error). Stream may not work.")
-                    print("This is a known compatibility issue. Transcription will be disabled.")
+                    logger.info(f"Warning: amazon-transcribe library version issue (proxies error). Stream may not work.")
+                    logger.info("This is a known compatibility issue. Transcription will be disabled.")
                     self.stream = None
                     self.is_streaming = False
                 else:
                     raise
         except Exception as e:
-            print(f"Error starting transcribe stream: {e}")
+            logger.info(f"Error starting transcribe stream: {e}")
             self.is_streaming = False
             self.stream = None
     
@@ -153,18 +233,27 @@ class Transcriber:
         try:
             if not self.stream:
                 return
+            # Hot loop: hoist bound methods to locals and use an exact type
+            # check - partials can arrive 10+ times a second and every
+            # attribute access here is a dict lookup
+            put = self._results.append
+            wake = self._results_evt.set
+            write = self._transcript_io.write
             async for event in self.stream.output_stream:
-                if isinstance(event, TranscriptEvent):
-                    results = event.transcript.results
-                    for result in results:
-                        if result.alternatives:
-                            transcript = result.alternatives[0].transcript
+                if type(event) is TranscriptEvent:
+                    for result in event.transcript.results:
+                        alts = result.alternatives
+                        if alts:
+                            transcript = alts[0].transcript
                             if transcript:  # Only send non-empty transcripts
+                                is_partial = result.is_partial
                                 # Send tuple: (transcript, is_partial)
-                                await self.results_queue.put((transcript, result.is_partial))
-                                if not result.is_partial:
-                                    # Final result - also add to buffer
-                                    self.transcription_buffer.append(transcript)
+                                put((transcript, is_partial))
+                                wake()
+                                if not is_partial:
+                                    # Final result - also append to the session transcript
+                                    write(transcript)
+                                    write(' ')
         except Exception as e:
             error_msg = str(e).lower()
             if "timeout" in error_msg or "no new audio" in error_msg:
@@ -174,176 +263,246 @@ class Transcriber:
                 self._result_processor_task = None
                 # Stream stays open, we'll restart the processor task when new audio arrives
             else:
-                print(f"Error processing stream results: {e}")
+                logger.info(f"Error processing stream results: {e}")
                 # Reset stream state on actual errors only
                 self.is_streaming = False
                 self.stream = None
                 self._result_processor_task = None
     
-    async def send_audio_chunk_async(self, audio_chunk: bytes) -> Optional[str]:
+    async def _send_frame(self, frame: bytes):
         """
-        Send audio chunk to AWS Transcribe Streaming and get transcription results
+        Send one audio frame to the Transcribe input stream
+        Works around the amazon-transcribe/awscrt busy-wait on audio underflow:
+        if the CRT layer reports it can't take more data, yield to the event
+        loop briefly instead of spinning at 100% CPU
+        """
+        send = self.stream.input_stream.send_audio_event
+        while True:
+            try:
+                await send(audio_chunk=frame)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(0.005)
+
+    async def send_audio_chunk_async(self, audio_chunk: bytes) -> bool:
+        """
+        Push audio into the persistent Transcribe stream (producer side)
+        Fire-and-forget: frames are sent immediately and the method returns
+        without waiting on results - the long-running result processor keeps
+        filling the results deque. Returns True if the audio was sent.
         """
         try:
+            # Degenerate path first: nothing to send, nothing to allocate
+            if not audio_chunk:
+                return False
+
+            # Cheap RMS VAD: pure silence isn't worth a paid API event or the
+            # downstream collection wait. One SIMD reduction over the chunk.
+            usable = len(audio_chunk) - (len(audio_chunk) % 2)
+            if usable:
+                arr = np.frombuffer(audio_chunk, dtype='<i2', count=usable // 2)
+                rms = float(np.sqrt(np.mean(np.square(arr.astype(np.float32)))))
+                if rms < self._vad_threshold:
+                    return False
+
             # Start stream if not already running
             if not self.is_streaming or not self.stream:
-                print(f"Starting transcribe stream for audio chunk of {len(audio_chunk)} bytes")
+                logger.info(f"Starting transcribe stream for audio chunk of {len(audio_chunk)} bytes")
                 await self._start_stream_async()
 
             if not self.stream:
-                print("Stream not available - cannot send to AWS Transcribe")
-                return None
-            
+                logger.info("Stream not available - cannot send to AWS Transcribe")
+                return False
+
             # Restart result processor task if it was stopped (e.g., after timeout)
             if not self._result_processor_task or self._result_processor_task.done():
                 self._result_processor_task = asyncio.create_task(self._process_stream_results())
                 self.is_streaming = True
 
-            if self.stream.input_stream:
-                # AWS Transcribe has frame size limits - chunk large audio into smaller pieces
-                max_frame_size = 8192  # 8KB max per frame
-                
-                # Start collecting transcripts in background
-                transcripts = []
-                partial_transcript = None
-                
-                async def collect_transcripts():
-                    """Collect transcripts while sending audio"""
-                    nonlocal transcripts, partial_transcript
-                    max_wait_time = 8.0
-                    start_time = asyncio.get_event_loop().time()
-                    last_transcript_time = start_time
-                    no_final_timeout = 2.0
-                    
-                    # Removed verbose logging
-                    while True:
-                        remaining_time = max_wait_time - (asyncio.get_event_loop().time() - start_time)
-                        if remaining_time <= 0:
-                            break
-                        
-                        current_time = asyncio.get_event_loop().time()
-                        
-                        # If we have final transcripts, wait 0.5s more
-                        if transcripts and (current_time - last_transcript_time > 0.5):
-                            await asyncio.sleep(0.5)
-                            break
-                        elif partial_transcript and not transcripts and (current_time - start_time > no_final_timeout):
-                            break
-                        
-                        try:
-                            result = await asyncio.wait_for(
-                                self.results_queue.get(),
-                                timeout=min(0.3, remaining_time)
-                            )
-                            
-                            transcript, is_partial = result
-                            
-                            if transcript:
-                                if is_partial:
-                                    partial_transcript = transcript
-                                    # Don't log partial transcripts to reduce noise
-                                else:
-                                    transcripts.append(transcript)
-                                    partial_transcript = None
-                                    last_transcript_time = asyncio.get_event_loop().time()
-                                    # Final transcripts will be logged at the end
-                        except asyncio.TimeoutError:
-                            if transcripts:
-                                if (asyncio.get_event_loop().time() - last_transcript_time) > 0.5:
-                                    break
-                                continue
-                            if not transcripts and not partial_transcript:
-                                continue
-                            if partial_transcript:
-                                if (asyncio.get_event_loop().time() - start_time) > no_final_timeout:
-                                    break
-                                continue
-                
-                # Start collection task
-                collection_task = asyncio.create_task(collect_transcripts())
-                
-                # Send audio frames
-                try:
-                    if len(audio_chunk) > max_frame_size:
-                        # Split large chunks silently
-                        for i in range(0, len(audio_chunk), max_frame_size):
-                            chunk_frame = audio_chunk[i:i+max_frame_size]
-                            await self.stream.input_stream.send_audio_event(audio_chunk=chunk_frame)
-                            await asyncio.sleep(0.05)  # Small delay between frames
-                    else:
-                        await self.stream.input_stream.send_audio_event(audio_chunk=audio_chunk)
-                except Exception as send_error:
-                    error_msg = str(send_error).lower()
-                    if "timeout" in error_msg or "no new audio" in error_msg:
-                        print(f"⚠️  Transcribe stream timed out - resetting")
-                        self.is_streaming = False
-                        self.stream = None
-                        if self._result_processor_task:
-                            self._result_processor_task.cancel()
-                            self._result_processor_task = None
-                        if not collection_task.done():
-                            collection_task.cancel()
-                        return None
-                    else:
-                        raise
-                
-                # Wait for collection to complete
-                try:
-                    await collection_task
-                except asyncio.CancelledError:
-                    print("Collection task cancelled")
-                    return None
-                
-                # Return collected transcripts
-                if transcripts:
-                    combined_transcript = " ".join(transcripts)
-                    print(f"Final transcription: {combined_transcript}")
-                    return combined_transcript
-                elif partial_transcript:
-                    print(f"No final transcripts, using last partial: {partial_transcript}")
-                    return partial_transcript
+            if not self.stream.input_stream:
+                logger.info("Stream input_stream not available")
+                return False
+
+            # Re-chunk into fixed 20ms frames; a partial tail frame stays in
+            # self._carry until the next chunk completes it
+            try:
+                # Hoist the loop's attribute lookups once per call; a large
+                # batch runs this body dozens of times
+                carry = self._carry
+                send_frame = self._send_frame
+                acquire = self._pool.acquire
+                release = self._pool.release
+                carry.extend(audio_chunk)
+                while len(carry) >= FRAME_BYTES:
+                    # Batch as many whole 20ms frames as fit one event.
+                    # Pooled buffer, refilled in place - no per-event
+                    # allocation, and no artificial pacing: the awaited
+                    # send_audio_event applies HTTP/2 flow control and
+                    # yields to the loop as needed
+                    n = min(len(carry) - len(carry) % FRAME_BYTES,
+                            MAX_EVENT_BYTES)
+                    buf = acquire()
+                    buf[:n] = carry[:n]
+                    del carry[:n]
+                    try:
+                        await send_frame(memoryview(buf)[:n])
+                    finally:
+                        release(buf)
+            except Exception as send_error:
+                error_msg = str(send_error).lower()
+                if "timeout" in error_msg or "no new audio" in error_msg:
+                    logger.info(f"⚠️  Transcribe stream timed out - resetting")
+                    self.is_streaming = False
+                    self.stream = None
+                    if self._result_processor_task:
+                        self._result_processor_task.cancel()
+                        self._result_processor_task = None
+                    return False
                 else:
-                    print("No transcription results received")
-                    return None
-            else:
-                print("Stream input_stream not available")
-                return None
+                    raise
+            return True
         except Exception as e:
-            print(f"Error processing audio chunk in async method: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+            # Full traceback at most once per 10s: symbolication is pure
+            # overhead when a closed stream makes every frame fail the same way
+            now = time.monotonic()
+            if now - self._last_exc_log > 10.0:
+                self._last_exc_log = now
+                logger.exception(f"Error processing audio chunk in async method: {type(e).__name__}: {e}")
+            else:
+                logger.info(f"Error processing audio chunk in async method: {type(e).__name__}: {e}")
+            return False
+
+    def poll_transcripts(self) -> list:
+        """
+        Drain whatever results are currently queued, without waiting
+        Returns a list of (transcript, is_partial) tuples
+        """
+        results = list(self._results)
+        self._results.clear()
+        return results
+
+    async def collect_transcript(self, max_wait: float = 8.0) -> Optional[str]:
+        """
+        Consumer side: await the transcript for the utterance just sent
+        Waits for final results until they stop arriving (0.5s settle window),
+        falls back to the last partial if no final arrives within 2s, and
+        gives up after max_wait.
+        """
+        transcripts = []
+        partial_transcript = None
+
+        # asyncio.timeout gives a native deadline handle instead of manual
+        # loop.time() bookkeeping on every iteration
+        try:
+            async with asyncio.timeout(max_wait):
+                while True:
+                    if not self._results:
+                        self._results_evt.clear()
+                        # Settle window: 0.5s once finals exist, 2s while only
+                        # partials have arrived; unbounded (up to the outer
+                        # deadline) before the first result
+                        settle = 0.5 if transcripts else 2.0
+                        try:
+                            if transcripts or partial_transcript:
+                                async with asyncio.timeout(settle):
+                                    await self._results_evt.wait()
+                            else:
+                                await self._results_evt.wait()
+                        except TimeoutError:
+                            break  # Results stopped arriving - utterance complete
+
+                    while self._results:
+                        transcript, is_partial = self._results.popleft()
+                        if transcript:
+                            if is_partial:
+                                partial_transcript = transcript
+                            else:
+                                transcripts.append(transcript)
+                                partial_transcript = None
+        except TimeoutError:
+            pass  # Outer deadline - return whatever was collected
+
+        if transcripts:
+            combined_transcript = " ".join(transcripts)
+            logger.info(f"Final transcription: {combined_transcript}")
+            return combined_transcript
+        elif partial_transcript:
+            logger.info(f"No final transcripts, using last partial: {partial_transcript}")
+            return partial_transcript
+        else:
+            logger.info("No transcription results received")
             return None
     
-    def send_audio_chunk(self, audio_chunk: bytes) -> Optional[str]:
+    def _ensure_loop(self):
+        """Lazily start the background event-loop thread for sync callers"""
+        if self._loop is None:
+            # Prefer uvloop for the dedicated loop: the send path is mostly
+            # await hops, where libuv beats the stdlib selector. Sync callers
+            # may never pass through the server entrypoint's uvloop.install()
+            try:
+                import uvloop
+                self._loop = uvloop.new_event_loop()
+            except ImportError:
+                self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._loop_thread.start()
+        return self._loop
+
+    def send_audio_chunk(self, audio_chunk: bytes) -> bool:
         """
         Send audio chunk to AWS Transcribe Streaming (sync wrapper)
-        Creates event loop if needed to call async method
+        Schedules onto the persistent background loop so the stream and its
+        connection state live across calls
         """
         try:
-            # Try to get existing event loop
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # Loop is running, need to use run_until_complete in thread
-                    import concurrent.futures
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(
-                            asyncio.run,
-                            self.send_audio_chunk_async(audio_chunk)
-                        )
-                        return future.result()
-                else:
-                    return loop.run_until_complete(self.send_audio_chunk_async(audio_chunk))
-            except RuntimeError:
-                # No event loop, create one
-                return asyncio.run(self.send_audio_chunk_async(audio_chunk))
+            loop = self._ensure_loop()
+            return asyncio.run_coroutine_threadsafe(
+                self.send_audio_chunk_async(audio_chunk), loop
+            ).result()
         except Exception as e:
-            print(f"Error processing audio chunk: {e}")
-            return None
+            logger.info(f"Error processing audio chunk: {e}")
+            return False
+
+    async def aclose(self):
+        """
+        Graceful async teardown: stop the result processor, end the AWS input
+        stream, and drop the stream reference. end_stream tells Transcribe the
+        session is over, so a disconnect doesn't leave a billed stream running
+        until the service times it out. Safe to call more than once.
+        """
+        self.is_streaming = False
+
+        if self._result_processor_task and not self._result_processor_task.done():
+            self._result_processor_task.cancel()
+            try:
+                await asyncio.wait_for(self._result_processor_task, timeout=1.0)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+        self._result_processor_task = None
+
+        stream, self.stream = self.stream, None
+        if stream and stream.input_stream:
+            try:
+                await stream.input_stream.end_stream()
+            except Exception as e:
+                logger.info(f"Error ending transcribe input stream: {e}")
+
+        self._carry.clear()
+        self.close()
+
+    def close(self):
+        """Stop the background event-loop thread, if one was started"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=1.0)
+            self._loop = None
+            self._loop_thread = None
     
     def get_transcription(self) -> Optional[str]:
         """Get the final transcription result"""
-        if self.transcription_buffer:
-            return ' '.join(self.transcription_buffer)
-        return None
+        return self._transcript_io.getvalue().rstrip() or None
+
+    def clear_transcription(self):
+        """Drop the accumulated session transcript"""
+        self._transcript_io = io.StringIO()
 
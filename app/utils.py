@@ -1,6 +1,36 @@
+import logging
+import logging.handlers
+import os
+import queue
+
+logger = logging.getLogger("app")
+
+def setup_async_logging(level=None):
+    """
+    Route all log records through an in-memory queue: the hot path only
+    enqueues a record, and a background listener thread does the blocking
+    stream writes. Returns the listener (call .stop() on shutdown).
+    """
+    if level is None:
+        level = os.getenv("LOGLEVEL", "INFO").upper()
+    log_q: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    # Replace any direct stream handlers with the queue handler
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_q))
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_q, stream_handler)
+    listener.start()
+    return listener
+
 def log_message(message: str):
     """Simple logging helper"""
-    print(f"[LOG] {message}")
+    logger.info(f"[LOG] {message}")
 
 def chunk_to_pcm(chunk: bytes) -> bytes:
     """
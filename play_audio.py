@@ -4,16 +4,26 @@ Utility to play audio output from the audio processing pipeline
 Usage: python play_audio.py <audio_file.wav> or read from stdin
 """
 import sys
-import wave
 import struct
 
 def save_pcm_to_wav(pcm_bytes, output_file="output.wav", sample_rate=16000, channels=1):
-    """Save PCM16 bytes to WAV file"""
-    with wave.open(output_file, 'wb') as wav_file:
-        wav_file.setnchannels(channels)
-        wav_file.setsampwidth(2)  # 16-bit = 2 bytes
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(pcm_bytes)
+    """Save PCM16 bytes to WAV file
+
+    Builds the 44-byte RIFF header with one struct.pack and writes header
+    plus data in two writes - no wave-module frame bookkeeping between the
+    PCM buffer and the file.
+    """
+    data_len = len(pcm_bytes)
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_len, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate,
+        sample_rate * channels * 2, channels * 2, 16,
+        b'data', data_len,
+    )
+    with open(output_file, 'wb') as f:
+        f.write(header)
+        f.write(pcm_bytes)
     print(f"Saved audio to {output_file}")
     return output_file
 
@@ -4,11 +4,13 @@ Real-time microphone client - records from your Mac's microphone
 and streams audio to the WebSocket server for transcription + LLM + TTS
 """
 import asyncio
+import collections
+import threading
 import sounddevice as sd
 import numpy as np
 import struct
 from websockets.client import connect
-import queue
+import socket
 import sys
 import os
 from dotenv import load_dotenv
@@ -21,17 +23,37 @@ CHANNELS = 1
 CHUNK_SIZE = 4096  # 4KB chunks
 DTYPE = np.int16
 SAMPLE_WIDTH = 2  # 16-bit = 2 bytes
+# Latency budget for playback: if the server runs ahead of the speaker by
+# more than this, the oldest audio is shed so we never play stale speech.
+# The server sends one frame per synthesized sentence, so the budget must
+# sit well above the largest single-sentence frame or normal responses
+# would be shed on arrival
+MAX_BUFFERED_BYTES = 10 * SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH  # 10 seconds
 
 class AudioRecorder:
     """Records audio from microphone using sounddevice"""
     def __init__(self):
         self.is_recording = False
-        self.audio_queue = queue.Queue()
+        # asyncio queue fed from the PortAudio thread via
+        # call_soon_threadsafe: the send loop awaits chunks instead of
+        # polling a thread-safe queue on a 10ms sleep
+        self.audio_queue = asyncio.Queue()
+        self._loop = None
         self.stream = None
-        
+        # Pool of recycled chunk buffers: the callback copies PortAudio's
+        # buffer straight into a reused bytearray instead of allocating a
+        # fresh bytes object per callback
+        self._pool = collections.deque(bytearray(CHUNK_SIZE) for _ in range(16))
+
+    def release_chunk(self, buf):
+        """Return a chunk buffer to the pool once it has been sent"""
+        self._pool.append(buf)
+
+
     def start_recording(self):
-        """Start recording from microphone"""
+        """Start recording from microphone (call from within the event loop)"""
         self.is_recording = True
+        self._loop = asyncio.get_running_loop()
         
         # Get default input device
         default_input = sd.default.device[0]
@@ -45,9 +67,24 @@ class AudioRecorder:
         def record_callback(indata, frames, time, status):
             """Callback for audio recording"""
             if self.is_recording:
-                # Convert numpy array to bytes (PCM16)
-                audio_bytes = indata.tobytes()
-                self.audio_queue.put(audio_bytes)
+                # Copy samples into a pooled buffer (no per-callback bytes
+                # allocation); the consumer returns it via release_chunk
+                try:
+                    buf = self._pool.popleft()
+                except IndexError:
+                    buf = bytearray(CHUNK_SIZE)
+                n = frames * CHANNELS * SAMPLE_WIDTH
+                if CHANNELS == 1:
+                    # Mono specialization: flat copy, no 2D view or stride
+                    # setup in the per-callback path
+                    np.copyto(np.frombuffer(buf, dtype=DTYPE, count=frames), indata[:, 0])
+                else:
+                    np.copyto(
+                        np.frombuffer(buf, dtype=DTYPE, count=frames * CHANNELS).reshape(-1, CHANNELS),
+                        indata,
+                    )
+                # Hop from the PortAudio thread into the event loop
+                self._loop.call_soon_threadsafe(self.audio_queue.put_nowait, (buf, n))
         
         self.stream = sd.InputStream(
             samplerate=SAMPLE_RATE,
@@ -65,57 +102,110 @@ class AudioRecorder:
         if self.stream:
             self.stream.stop()
             self.stream.close()
-        
-    def get_audio_chunk(self):
-        """Get next audio chunk from queue"""
-        try:
-            return self.audio_queue.get(timeout=0.1)
-        except queue.Empty:
-            return None
+        # Sentinel so a send loop blocked on the queue wakes up and exits
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self.audio_queue.put_nowait, None)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    async def get_audio_chunk(self):
+        """Await the next (buffer, length) pair; None is the stop sentinel"""
+        return await self.audio_queue.get()
 
 class AudioPlayer:
-    """Plays audio responses from server using sounddevice"""
+    """Streams audio responses from the server as they arrive
+
+    A RawOutputStream pulls PCM from a deque-backed ring in its PortAudio
+    callback, so the response is audible as soon as the first chunk lands
+    instead of after the whole payload has accumulated. Underruns play
+    silence; playback overlaps reception for free.
+    """
     def __init__(self):
-        self.response_audio = b''
-        self.is_playing = False  # Flag to prevent multiple simultaneous playback
-        
+        self._lock = threading.Lock()
+        self._ring = collections.deque()  # queued PCM16 chunks
+        self._leftover = b''  # tail of a chunk partially consumed by the callback
+        self._pending = 0  # bytes queued but not yet played
+        self.stream = sd.RawOutputStream(
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            dtype='int16',
+            blocksize=1024,
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    def _callback(self, outdata, frames, time_, status):
+        """PortAudio pull callback: fill outdata from the ring, zero-fill on underrun"""
+        needed = frames * CHANNELS * SAMPLE_WIDTH
+        out = memoryview(outdata)
+        filled = 0
+        with self._lock:
+            if self._leftover:
+                take = min(len(self._leftover), needed)
+                out[:take] = self._leftover[:take]
+                self._leftover = self._leftover[take:]
+                filled = take
+            while filled < needed and self._ring:
+                chunk = self._ring.popleft()
+                take = min(len(chunk), needed - filled)
+                out[filled:filled + take] = chunk[:take]
+                if take < len(chunk):
+                    self._leftover = chunk[take:]
+                filled += take
+            self._pending -= filled
+        if filled < needed:
+            out[filled:needed] = b'\x00' * (needed - filled)
+
+    @property
+    def pending_bytes(self):
+        """Bytes queued for playback but not yet played"""
+        with self._lock:
+            return self._pending
+
     def add_audio(self, audio_bytes):
-        """Add audio bytes to buffer"""
-        self.response_audio += audio_bytes
-        
-    def play(self):
-        """Play accumulated audio (only if not already playing)"""
-        if len(self.response_audio) == 0:
-            return
-        
-        if self.is_playing:
-            print("⚠️  Already playing audio, skipping duplicate playback")
-            return
-            
-        print(f"\n🔊 Playing response ({len(self.response_audio)} bytes)...")
-        self.is_playing = True
-        
-        try:
-            # Convert bytes to numpy array
-            audio_array = np.frombuffer(self.response_audio, dtype=DTYPE)
-            audio_array = audio_array.reshape(-1, CHANNELS)
-            
-            # Play audio
-            sd.play(audio_array, samplerate=SAMPLE_RATE)
-            sd.wait()  # Wait until playback is finished
-            
-            print("✅ Finished playing response\n")
-            
-        except Exception as e:
-            print(f"Error playing audio: {e}")
-        finally:
-            # Always clear buffer and flag
-            self.response_audio = b''
-            self.is_playing = False
-            
+        """Queue audio for the output stream - playback starts immediately
+
+        Enforces the latency budget: when more than MAX_BUFFERED_BYTES is
+        queued, the oldest audio is trimmed rather than the newest, keeping
+        user-perceived latency bounded if the speaker falls behind. Only
+        audio older than the chunk just queued is ever shed, so one large
+        response frame is never discarded on arrival.
+        """
+        chunk = bytes(audio_bytes)
+        with self._lock:
+            self._ring.append(chunk)
+            self._pending += len(chunk)
+            # Shed only what is both over budget and older than this chunk
+            sheddable = min(self._pending - MAX_BUFFERED_BYTES,
+                            self._pending - len(chunk))
+            shed = 0
+            while shed < sheddable:
+                if self._leftover:
+                    take = min(len(self._leftover), sheddable - shed)
+                    self._leftover = self._leftover[take:]
+                elif self._ring[0] is not chunk:
+                    old = self._ring[0]
+                    take = min(len(old), sheddable - shed)
+                    if take == len(old):
+                        self._ring.popleft()
+                    else:
+                        # Trim the oldest chunk instead of dropping it whole
+                        self._ring[0] = old[take:]
+                else:
+                    break
+                shed += take
+            self._pending -= shed
+        if shed:
+            print(f"⚠️  Shed {shed} bytes of stale audio (over {MAX_BUFFERED_BYTES} byte latency budget)")
+
     def cleanup(self):
         """Cleanup audio resources"""
-        sd.stop()
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception:
+            pass
 
 async def mic_client():
     """Real-time microphone client"""
@@ -128,80 +218,72 @@ async def mic_client():
     try:
         recorder.start_recording()
         
-        # Configure longer ping interval for audio streaming
+        # Configure longer ping interval for audio streaming.
+        # compression=None skips permessage-deflate: PCM16 is incompressible,
+        # so deflate would just burn CPU and re-copy every frame
         async with connect(
             uri,
             ping_interval=20,  # Send ping every 20 seconds
-            ping_timeout=10    # Wait 10 seconds for pong
+            ping_timeout=10,   # Wait 10 seconds for pong
+            compression=None,
+            max_size=None,     # Responses arrive as one large binary frame
+            subprotocols=["audio.pcm16"]  # Binary-only channel
         ) as websocket:
+            # Socket tuning: disable Nagle so small audio frames go out
+            # immediately, and enlarge the send buffer for bursts
+            sock = websocket.transport.get_extra_info('socket')
+            if sock is not None:
+                try:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+                except OSError:
+                    pass
             print("✅ Connected to server!")
             print("\n" + "="*60)
             print("Ready to record! Speak naturally into your microphone.")
             print("Server will detect pauses and respond automatically.")
             print("="*60 + "\n")
             
-            # Initialize response buffer
-            audio_response = b''
-            
             # Task to receive responses
             async def receive_responses():
-                nonlocal audio_response
                 sending_complete = asyncio.Event()
-                
+
                 async def receive_loop():
-                    nonlocal audio_response
+                    """Queue response chunks onto the streaming player as they arrive
+
+                    Playback is handled by the RawOutputStream callback, so
+                    there is no accumulate-then-play threshold or quiescence
+                    wait - the first chunk is audible immediately.
+                    """
                     consecutive_timeouts = 0
-                    max_consecutive_timeouts = 5  # Increased to wait longer
-                    last_audio_time = None
-                    chunk_received = False  # Track if we've received any chunks in this response
-                    
+                    max_consecutive_timeouts = 2  # Stop soon after sending ends
+                    # Throttle progress prints to ~5Hz: a print per chunk is a
+                    # write syscall on the event loop thread and can stall
+                    # WebSocket I/O on slow terminals
+                    loop = asyncio.get_running_loop()
+                    last_log_t = 0.0
+
                     while not shutdown_requested:
                         try:
-                            # Use longer timeout to wait for complete responses
-                            timeout = 3.0 if not sending_complete.is_set() else 8.0  # Increased from 1.0/5.0
-                            response = await asyncio.wait_for(websocket.recv(), timeout=timeout)
-                            
+                            # asyncio.timeout schedules one timer around the
+                            # bare recv() - wait_for would wrap every recv in
+                            # a fresh Task just to time it out
+                            timeout = 3.0 if not sending_complete.is_set() else 8.0
+                            async with asyncio.timeout(timeout):
+                                response = await websocket.recv()
+
                             consecutive_timeouts = 0
-                            last_audio_time = asyncio.get_event_loop().time()
-                            chunk_received = True
-                            
-                            if isinstance(response, str):
-                                response = response.encode()
-                            
-                            audio_response += bytes(response)
-                            print(f"📥 Received {len(response)} bytes of audio response (total: {len(audio_response)} bytes)")
-                            
-                            # Don't play immediately - wait for complete response
-                            # Only play if we've received a very large amount (>128KB) which suggests it's complete
-                            if len(audio_response) > 131072:  # 128KB threshold (was 32KB)
-                                print(f"📦 Large response accumulated ({len(audio_response)} bytes), waiting for completion...")
-                            
+
+                            # Binary subprotocol: frames are always bytes, no
+                            # isinstance check needed on the hot path
+                            player.add_audio(response)
+                            now = loop.time()
+                            if now - last_log_t >= 0.2:
+                                last_log_t = now
+                                print(f"📥 Received {len(response)} bytes of audio (streaming to speaker)")
+
                         except asyncio.TimeoutError:
                             consecutive_timeouts += 1
-                            
-                            # If we have audio and no new audio for 2.5 seconds, play it
-                            # Increased from 1.0s to 2.5s to wait for all chunks
-                            if audio_response and last_audio_time and not player.is_playing:
-                                time_since_last = asyncio.get_event_loop().time() - last_audio_time
-                                if time_since_last > 2.5:  # Wait 2.5 seconds after last chunk
-                                    print(f"🎵 No new audio for {time_since_last:.1f}s, playing complete response ({len(audio_response)} bytes)...")
-                                    if not shutdown_requested:
-                                        player.add_audio(audio_response)
-                                        player.play()
-                                        audio_response = b''
-                                        last_audio_time = None
-                                        chunk_received = False
-                            
-                            # Also check if we stopped sending and have audio (but only if not already playing)
-                            if sending_complete.is_set() and audio_response and not player.is_playing:
-                                if not chunk_received or consecutive_timeouts >= 2:  # Wait 2 timeouts after sending stops
-                                    print(f"🎵 Sending complete, playing final response ({len(audio_response)} bytes)...")
-                                    if not shutdown_requested:
-                                        player.add_audio(audio_response)
-                                        player.play()
-                                        audio_response = b''
-                                    break
-                            
                             if sending_complete.is_set() and consecutive_timeouts >= max_consecutive_timeouts:
                                 break
                             continue
@@ -214,47 +296,52 @@ async def mic_client():
                             else:
                                 print(f"Error receiving: {e}")
                                 break
-                    
-                    # Play any remaining accumulated response if not shutting down and not already playing
-                    # Wait a bit more in case there are final chunks arriving
-                    if audio_response and not shutdown_requested and not player.is_playing:
-                        # Give a final chance for any remaining chunks
-                        try:
-                            await asyncio.sleep(0.5)  # Brief wait for any final chunks
-                            # Try to receive one more chunk quickly
-                            try:
-                                final_chunk = await asyncio.wait_for(websocket.recv(), timeout=0.5)
-                                if isinstance(final_chunk, str):
-                                    final_chunk = final_chunk.encode()
-                                audio_response += bytes(final_chunk)
-                                print(f"📥 Received final chunk: {len(final_chunk)} bytes")
-                            except (asyncio.TimeoutError, Exception):
-                                pass  # No more chunks, proceed to play
-                        except Exception:
-                            pass
-                        
-                        print(f"🎵 Playing final accumulated audio ({len(audio_response)} bytes)...")
-                        player.add_audio(audio_response)
-                        player.play()
-                        audio_response = b''
-                    elif audio_response:
-                        print(f"⚠️  Discarding {len(audio_response)} bytes of audio (shutdown or already playing)")
-                        audio_response = b''
-                
+
+                    # Let queued audio finish playing before tearing down
+                    while player.pending_bytes > 0 and not shutdown_requested:
+                        await asyncio.sleep(0.1)
+
                 receive_task = asyncio.create_task(receive_loop())
                 
-                # Send audio chunks continuously
+                # Send audio chunks continuously: await the queue (no polling
+                # sleep), and drain any backlog into back-to-back sends so the
+                # TCP stack can batch them. Sub-threshold chunks are coalesced
+                # into one WS frame so short PortAudio callbacks don't each pay
+                # frame-header and syscall cost
                 chunk_count = 0
+                audio_q = recorder.audio_queue
+                send_buf = bytearray()
+                SEND_THRESHOLD = 3200  # 100ms of 16kHz PCM16 per WS frame
+                send_loop_time = asyncio.get_running_loop().time
+                last_send_log = 0.0
                 while recorder.is_recording and not shutdown_requested:
                     try:
-                        audio_chunk = recorder.get_audio_chunk()
-                        if audio_chunk:
-                            await websocket.send(audio_chunk)
-                            chunk_count += 1
-                            if chunk_count % 10 == 0:  # Print every 10 chunks
+                        item = await recorder.get_audio_chunk()
+                        while item is not None:
+                            buf, n = item
+                            try:
+                                if not send_buf and n >= SEND_THRESHOLD:
+                                    # Full chunk, nothing pending: zero-copy
+                                    # memoryview send straight from the pool
+                                    await websocket.send(memoryview(buf)[:n])
+                                    chunk_count += 1
+                                else:
+                                    send_buf.extend(memoryview(buf)[:n])
+                            finally:
+                                recorder.release_chunk(buf)
+                            if len(send_buf) >= SEND_THRESHOLD:
+                                await websocket.send(send_buf)
+                                send_buf.clear()
+                                chunk_count += 1
+                            now = send_loop_time()
+                            if now - last_send_log >= 0.2:  # ~5Hz status line
+                                last_send_log = now
                                 print(f"📤 Sent {chunk_count} chunks...", end='\r')
-                        
-                        await asyncio.sleep(0.01)  # Small delay to prevent busy loop
+                            if audio_q.empty():
+                                break
+                            item = audio_q.get_nowait()
+                        if item is None:
+                            break  # Stop sentinel from stop_recording
                     except Exception as send_error:
                         if shutdown_requested:
                             break
@@ -266,6 +353,14 @@ async def mic_client():
                             print(f"\n⚠️  Error sending audio: {send_error}")
                             raise
                 
+                # Flush any coalesced tail before signalling completion
+                if send_buf and not shutdown_requested:
+                    try:
+                        await websocket.send(send_buf)
+                        send_buf.clear()
+                    except Exception:
+                        pass
+
                 sending_complete.set()
                 # Wait for receive task, but don't wait too long on shutdown
                 try:
@@ -292,6 +387,13 @@ async def mic_client():
         print("✅ Disconnected")
 
 if __name__ == "__main__":
+    # uvloop speeds up the recv/send hot loop; fall back to the stdlib
+    # loop where unavailable (same pattern as the server entrypoint)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     try:
         asyncio.run(mic_client())
     except KeyboardInterrupt:
@@ -1,7 +1,9 @@
 import asyncio
-import struct
+import functools
 import os
+import socket
 import sys
+import numpy as np
 from websockets.client import connect
 from dotenv import load_dotenv
 
@@ -35,35 +37,38 @@ def generate_speech_pcm16(text="whats your name?", sample_rate=16000):
 def save_pcm16_to_wav(pcm_bytes, filename, sample_rate=16000, channels=1):
     """
     Save PCM16 bytes to a WAV file so you can play and hear it
+    Writes the 44-byte RIFF header with one struct.pack and streams the
+    payload straight to disk - no wave-module frame bookkeeping or re-copy.
     """
-    import wave
-    
-    with wave.open(filename, 'wb') as wav_file:
-        wav_file.setnchannels(channels)  # Mono
-        wav_file.setsampwidth(2)  # 16-bit = 2 bytes
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(pcm_bytes)
+    import struct
+
+    data_len = len(pcm_bytes)
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_len, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate,
+        sample_rate * channels * 2, channels * 2, 16,
+        b'data', data_len,
+    )
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.write(pcm_bytes)
     print(f"Saved audio to {filename} - you can play it to hear the tone!")
 
+@functools.lru_cache(maxsize=8)
 def generate_pcm16_tone(duration_seconds=2, sample_rate=16000, frequency=440):
     """
     Generate PCM16 audio (16-bit, mono, 16kHz) - a simple tone for testing
-    No external dependencies needed!
+    Vectorized with NumPy: the sine, scaling and int16 cast run in C over
+    the whole buffer instead of a per-sample Python loop with struct.pack.
+    The result is memoized - the tone is static for its parameters, so
+    repeat calls return the cached bytes.
     """
-    import math
     num_samples = int(sample_rate * duration_seconds)
-    audio_bytes = bytearray()
-    
-    for i in range(num_samples):
-        # Generate sine wave: sin(2π * frequency * time)
-        time = i / sample_rate
-        sample_float = math.sin(2 * math.pi * frequency * time)
-        # Convert to 16-bit signed integer (scale to avoid clipping)
-        sample_value = int(32767 * 0.3 * sample_float)
-        # Pack as 16-bit signed integer (little-endian)
-        audio_bytes.extend(struct.pack('<h', sample_value))
-    
-    return bytes(audio_bytes)
+    t = np.arange(num_samples, dtype=np.float32) / sample_rate
+    # Sine wave scaled to 30% full amplitude to avoid clipping
+    samples = (32767 * 0.3 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+    return samples.tobytes()
 
 async def test_client():
     uri = "ws://localhost:8765"
@@ -92,11 +97,23 @@ async def test_client():
     
     chunk_size = 4096  # 4KB chunks
     
-    async with connect(uri) as websocket:
+    # compression=None: PCM16 is incompressible, permessage-deflate would
+    # just burn CPU; max_size=None accepts large single-frame responses
+    async with connect(uri, compression=None, max_size=None,
+                       subprotocols=["audio.pcm16"]) as websocket:
+        # Disable Nagle and enlarge the send buffer for the audio burst
+        sock = websocket.transport.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            except OSError:
+                pass
         print("Connected to server!")
 
-        # Initialize audio response buffer
-        audio_response = b''
+        # Response accumulates as a list of chunks joined once at the end -
+        # appends never recopy the payload
+        audio_chunks = []
 
         # Send chunks and receive responses in streaming mode
         total_chunks = len(pcm_bytes) // chunk_size + (1 if len(pcm_bytes) % chunk_size else 0)
@@ -107,7 +124,7 @@ async def test_client():
         # Create a task to receive responses while sending
         async def receive_responses():
             response_count = 0
-            nonlocal audio_response
+            nonlocal audio_chunks
             max_wait_after_send = 15.0  # Wait up to 15 seconds after sending completes
             consecutive_timeouts = 0
             max_consecutive_timeouts = 3  # Stop after 3 consecutive timeouts
@@ -119,22 +136,23 @@ async def test_client():
                         timeout = 5.0  # Longer timeout after sending is done
                     else:
                         timeout = 1.0  # Short timeout while still sending
-                    
-                    response = await asyncio.wait_for(websocket.recv(), timeout=timeout)
+
+                    # One timer around the bare recv() instead of a wait_for
+                    # wrapper Task per receive
+                    async with asyncio.timeout(timeout):
+                        response = await websocket.recv()
                     
                     # Reset timeout counter on successful receive
                     consecutive_timeouts = 0
-                    
-                    # Ensure response is bytes
-                    if isinstance(response, str):
-                        response = response.encode()
-                    
+
+                    # Binary subprotocol: frames are always bytes
                     response_count += 1
                     print(f"Received response #{response_count}: {len(response)} bytes")
                     
-                    # Save audio response from server
+                    # Save audio response from server - append the frame
+                    # directly, no intermediate copy
                     if response and len(response) > 0:
-                        audio_response += bytes(response)
+                        audio_chunks.append(response)
                         
                 except asyncio.TimeoutError:
                     consecutive_timeouts += 1
@@ -152,7 +170,8 @@ async def test_client():
                     print(f"Error receiving response: {e}")
                     break
             
-            print(f"Total responses received: {response_count}, Total audio: {len(audio_response)} bytes")
+            total = sum(len(c) for c in audio_chunks)
+            print(f"Total responses received: {response_count}, Total audio: {total} bytes")
             return response_count
         
         # Start receiving responses in background
@@ -174,20 +193,29 @@ async def test_client():
         # Wait for all responses
         await receive_task
         
-        # Save and play the complete audio response
-        if audio_response and len(audio_response) > 0:
+        # Save and play the complete audio response (single O(N) join)
+        audio_response = b"".join(audio_chunks)
+        if audio_response:
             output_file = "server_response.wav"
             save_pcm16_to_wav(audio_response, output_file, sample_rate=16000)
             print(f"\n✅ Audio response saved to {output_file}")
             print("Playing audio response...")
             
-            # Play audio (macOS)
+            # Play audio (macOS) - async subprocess so the event loop keeps
+            # running (connection close, pings) while the audio plays
             import platform
-            import subprocess
             if platform.system() == "Darwin":
-                subprocess.run(["afplay", output_file])
+                proc = await asyncio.create_subprocess_exec("afplay", output_file)
+                await proc.wait()
             else:
                 print(f"Please play {output_file} manually")
 
 if __name__ == "__main__":
+    # uvloop speeds up the recv/send hot loop; fall back to the stdlib
+    # loop where unavailable (same pattern as the server entrypoint)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(test_client())